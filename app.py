@@ -1,30 +1,112 @@
 import os
-import uuid
-from flask import Flask, request, jsonify, send_from_directory
+import click
+from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_restful import Api, Resource
-from sqlalchemy.orm import joinedload
-from models import db, User, Post, Comment, Category, Tag, Reply
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import NotFound
+from sqlalchemy.orm import joinedload, load_only
+from models import db, User, Post, Comment, Category, Tag, Reply, PostNeighbor
+from pagination import LEGACY_PAGE_SIZE, PaginationError, keyset_page, legacy_headers, parse_limit
+from queries import (
+    DETAIL_FIELDS, MAX_BATCH_COMMENTS, SUMMARY_FIELDS, FieldsetError, comment_query, parse_comment_ids,
+    parse_fieldset, post_detail_query, post_fieldset_query, post_summary_query, replies_for_comments,
+    reply_counts,
+)
+from cache import response_cache
+from hashing import HashingUnavailable, password_hasher
+from auth import current_user_id, init_auth, issue_token
+from storage import upload_store
+from thumbnails import thumbnails
+from search import include_object, search_posts
+from related import neighbor_refills, rebuild_all, refresh_neighbors
+from bulk import import_posts
+from counters import check_counts
+from stats import category_stats, refresh_stats, tag_stats
+from serialization import FastJSONProvider, output_json
+from compression import compressor
+from instrumentation import sql_instrumentation
+from metrics import metrics
+from conditional import comments_etag, etag_header, not_modified, post_etag, posts_etag, table_etag
 
 app = Flask(__name__)
-app.secret_key = 'supersecretkey'
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URI')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB limit
-app.json.compact = False
+# Compact JSON unless JSON_PRETTY is set (debug mode pretty-prints too)
+app.json = FastJSONProvider(app)
+if os.environ.get('JSON_PRETTY'):
+    app.json.compact = False
+
+# Responses with at least this many bytes are gzip/brotli compressed; -1 disables compression
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
+# Per-request query counts and Server-Timing headers, plus a warning when one statement repeats
+app.config['SQL_INSTRUMENTATION'] = os.environ.get('SQL_INSTRUMENTATION', '').lower() in ('1', 'true', 'yes')
+app.config['SQL_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 10))
+
+# Prometheus metrics at /metrics. With several worker processes, point METRICS_DIR at a
+# directory they share (emptied on deploy) so any worker can report for all of them
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+# Read-endpoint response cache: 'memory' (per process), 'redis' (shared) or 'none'
+app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+app.config['RESPONSE_CACHE_REDIS_URL'] = os.environ.get('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Password hashing pool; PASSWORD_HASH_WORKERS=0 hashes inline on the request thread
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(os.cpu_count() or 1, 4)))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))
+app.config['PASSWORD_HASH_TIMEOUT'] = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+
+# Access tokens are signed with AUTH_TOKEN_SECRET, or SECRET_KEY when it is unset; the app
+# refuses to start without one of them
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+app.config['AUTH_TOKEN_SECRET'] = os.environ.get('AUTH_TOKEN_SECRET') or app.config['SECRET_KEY']
+app.config['AUTH_TOKEN_TTL'] = int(os.environ.get('AUTH_TOKEN_TTL', 24 * 3600))
+
+# Users allowed to set user_id on bulk-imported posts (comma-separated ids); others import as themselves
+app.config['BULK_IMPORT_ADMINS'] = {
+    int(user_id) for user_id in os.environ.get('BULK_IMPORT_ADMINS', '').split(',') if user_id.strip()
+}
+app.config['BULK_IMPORT_MAX_ITEMS'] = int(os.environ.get('BULK_IMPORT_MAX_ITEMS', 5000))
+
+# Resized WebP variants of uploads are rendered by this many background threads; 0 disables them
+app.config['THUMBNAIL_WORKERS'] = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Related-post lists that lose an entry are refilled by this many background threads after
+# the write commits; 0 refills them inline, inside the write's transaction
+app.config['RELATED_REFILL_WORKERS'] = int(os.environ.get('RELATED_REFILL_WORKERS', 1))
+
+# Uploads are streamed by Python unless the front proxy does it: 'x-sendfile' (Apache, lighttpd)
+# or 'x-accel-redirect' (nginx, with an internal location at UPLOAD_ACCEL_PREFIX)
+app.config['UPLOAD_SENDFILE'] = os.environ.get('UPLOAD_SENDFILE', '')
+app.config['UPLOAD_ACCEL_PREFIX'] = os.environ.get('UPLOAD_ACCEL_PREFIX', '/_uploads/')
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
 db.init_app(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, include_object=include_object)
 api = Api(app)
+api.representations['application/json'] = output_json
 CORS(app)
+metrics.init_app(app)
+sql_instrumentation.init_app(app)
+# Registered before the response cache so it runs after it: the cache keeps uncompressed bodies
+compressor.init_app(app)
+response_cache.init_app(app)
+password_hasher.init_app(app)
+init_auth(app)
+upload_store.init_app(app)
+thumbnails.init_app(app)
+neighbor_refills.init_app(app)
 
 # Ensure upload directory exists at startup
 with app.app_context():
@@ -35,10 +117,44 @@ def allowed_file(filename):
     return '.' in filename and \
         filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def store_upload(file, extension):
+    """Save an upload under its content hash and queue its thumbnails; returns the stored name."""
+    stored_name, created = upload_store.save(file, extension)
+    metrics.record_upload(os.path.getsize(os.path.join(app.config['UPLOAD_FOLDER'], stored_name)), created)
+    thumbnails.generate(stored_name)
+    return stored_name
+
+def wants_page():
+    """Clients opt in to cursor pagination by sending `limit` or `cursor`; others get legacy_posts()."""
+    return 'limit' in request.args or 'cursor' in request.args
+
+def requested_fields(default):
+    """The ?fields= / ?include= selection, or None for the endpoint's usual shape."""
+    return parse_fieldset(request.args.get('fields'), request.args.get('include'), default)
+
+def render_posts(posts, fields=None):
+    if fields is None:
+        return [post.to_summary_dict() for post in posts]
+    return [post.to_fields_dict(fields) for post in posts]
+
+def paginate_posts(query, fields=None):
+    limit = parse_limit(request.args.get('limit'))
+    posts, next_cursor = keyset_page(query, Post, limit, request.args.get('cursor'))
+    return {"posts": render_posts(posts, fields), "next_cursor": next_cursor}
+
+def legacy_posts(query, fields=None):
+    """The deprecated bare array for clients that send neither `limit` nor `cursor`: (body, headers)."""
+    posts, next_cursor = keyset_page(query, Post, LEGACY_PAGE_SIZE)
+    return render_posts(posts, fields), legacy_headers(request.path, request.args.to_dict(), next_cursor)
+
 @app.route('/')
 def welcome():
     return {"message": "Welcome to Blogpost App!"}, 200
 
+@app.route('/metrics', endpoint='metrics')
+def metrics_endpoint():
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # Add authentication routes
 @app.route('/auth/login', methods=['POST'])
 def login():
@@ -66,6 +182,12 @@ def login():
     try:
         if not user.check_password(password):
             return jsonify({"error": "Invalid email/username or password"}), 401
+        # Transparently upgrade hashes made with an older method or cost
+        if password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+    except HashingUnavailable:
+        return jsonify({"error": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         print(f"Password check error: {str(e)}")
         return jsonify({"error": "Authentication error"}), 500
@@ -73,7 +195,8 @@ def login():
     return jsonify({
         "message": "Login successful",
         "user": user.to_dict(),
-        "token": "demo_token_123"  # Replace with JWT later
+        "token": issue_token(user.id),
+        "expires_in": app.config['AUTH_TOKEN_TTL']
     }), 200
     
 @app.route('/auth/register', methods=['POST', 'OPTIONS'])
@@ -94,13 +217,18 @@ def register():
         return jsonify({"error": "Email already registered"}), 409
     
     new_user = User(username=username, email=email)
-    new_user.set_password(password)
+    try:
+        new_user.set_password(password)
+    except HashingUnavailable:
+        return jsonify({"error": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
     db.session.add(new_user)
     db.session.commit()
     
     return jsonify({
         "message": "User created successfully",
-        "user": new_user.to_dict()
+        "user": new_user.to_dict(),
+        "token": issue_token(new_user.id),
+        "expires_in": app.config['AUTH_TOKEN_TTL']
     }), 201
 
 # New file upload endpoint
@@ -115,19 +243,12 @@ def upload_file():
     
     if file and allowed_file(file.filename):
         try:
-            # Generate unique filename
-            filename = secure_filename(file.filename)
-            unique_filename = f"{uuid.uuid4().hex}_{filename}"
-            
-            # Create upload directory if it doesn't exist
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            
-            # Save file
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            file.save(file_path)
+            # Stored under its content hash; repeat uploads reuse the existing file
+            extension = file.filename.rsplit('.', 1)[1].lower()  # checked by allowed_file
+            stored_name = store_upload(file, extension)
             
             # Return URL
-            image_url = f"/static/uploads/{unique_filename}"
+            image_url = f"/static/uploads/{stored_name}"
             return jsonify({
                 'url': image_url,
                 'message': 'File uploaded successfully'
@@ -143,8 +264,14 @@ def upload_file():
 @app.route('/static/uploads/<filename>')
 def serve_uploaded_file(filename):
     try:
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-    except FileNotFoundError:
+        if not os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], filename)):
+            # A variant that has not been rendered yet: serve the original meanwhile
+            original = thumbnails.original_for(filename)
+            if original:
+                thumbnails.generate(original)
+                return upload_store.send(original, immutable=False)
+        return upload_store.send(filename)
+    except NotFound:
         return jsonify({'error': 'File not found'}), 404
 
 # Keep the old upload endpoint for backward compatibility
@@ -157,15 +284,10 @@ def upload_image():
     if not allowed_file(image.filename):
         return {"error": "Invalid file type"}, 400
         
-    filename = secure_filename(image.filename)
-    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-    upload_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-    
-    # Create directory if it doesn't exist
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    image.save(upload_path)
+    extension = image.filename.rsplit('.', 1)[1].lower()  # checked by allowed_file
+    stored_name = store_upload(image, extension)
     
-    return {"url": f"/static/uploads/{unique_filename}"}, 201
+    return {"url": f"/static/uploads/{stored_name}"}, 201
 
 # my-posts endpoint
 @app.route('/posts/my-posts', methods=['GET', 'OPTIONS'])
@@ -173,28 +295,154 @@ def get_my_posts():
     if request.method == 'OPTIONS':
         return '', 200  # Handle preflight request
 
-    user_id = request.args.get('user_id')  # frontend should pass ?user_id=...
+    user_id = current_user_id()  # from the Authorization: Bearer token
     if not user_id:
-        return jsonify({"error": "User ID required"}), 400
+        return jsonify({"error": "Authentication required"}), 401
 
     try:
-        posts = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc()).all()
-        return jsonify([post.to_dict() for post in posts]), 200
+        fields = requested_fields(SUMMARY_FIELDS)
+        query = post_summary_query() if fields is None else post_fieldset_query(fields)
+        query = query.filter(Post.user_id == user_id)
+        if wants_page():
+            return jsonify(paginate_posts(query, fields)), 200
+        posts, headers = legacy_posts(query, fields)
+        return jsonify(posts), 200, headers
+    except (PaginationError, FieldsetError) as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Error fetching my posts: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+def read_bulk_items():
+    """Items from a JSON array (or {"posts": [...]}) or an NDJSON body; unparsable lines become ValueErrors."""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = []
+        for line in request.stream:
+            if line.strip():
+                try:
+                    items.append(app.json.loads(line))
+                except ValueError as e:
+                    items.append(ValueError(f"Invalid JSON: {e}"))
+        return items
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('posts')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of posts or an NDJSON body")
+    return data
+
+@app.route('/posts/bulk', methods=['POST'])
+def bulk_create_posts():
+    user_id = current_user_id()
+    if not user_id:
+        return jsonify({"error": "Authentication required"}), 401
+    try:
+        items = read_bulk_items()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if len(items) > app.config['BULK_IMPORT_MAX_ITEMS']:
+        return jsonify({"error": f"At most {app.config['BULK_IMPORT_MAX_ITEMS']} posts per request"}), 413
+
+    try:
+        created, errors = import_posts(items, user_id, user_id in app.config['BULK_IMPORT_ADMINS'])
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error importing posts: {str(e)}")
+        return jsonify({"error": "Internal server error"}), 500
+    status = 201 if created else 400
+    return jsonify({"created": created, "errors": errors}), status
+
+@app.route('/posts/search', methods=['GET'])
+def search():
+    text = (request.args.get('q') or '').strip()
+    if not text:
+        return jsonify({"error": "Query parameter q is required"}), 400
+
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        hits, next_cursor = search_posts(text, limit, request.args.get('cursor'))
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    scores = dict(hits)
+    posts = {p.id: p for p in post_summary_query().filter(Post.id.in_(scores)).all()}
+    results = []
+    for post_id, score in hits:
+        if post_id in posts:
+            results.append({**posts[post_id].to_summary_dict(), "score": score})
+    return jsonify({"posts": results, "next_cursor": next_cursor}), 200
+
 @app.route('/posts/<int:post_id>/related', methods=['GET'])
 def get_related_posts(post_id):
-    post = Post.query.get_or_404(post_id)
-    # Fetch 3 other published posts from same category, excluding the current one
+    # Precomputed neighbours ranked by shared tags and recency (see related.py)
     related = (
-        Post.query
+        post_summary_query()
+        .join(PostNeighbor, PostNeighbor.neighbor_id == Post.id)
+        .filter(PostNeighbor.post_id == post_id)
+        .order_by(PostNeighbor.rank.desc())
+        .limit(3)
+        .all()
+    )
+    if related:
+        return jsonify([p.to_summary_dict() for p in related]), 200
+
+    # No tag overlap: fall back to other published posts from the same category
+    post = Post.query.options(load_only(Post.id, Post.category_id)).get_or_404(post_id)
+    related = (
+        post_summary_query()
         .filter(Post.category_id == post.category_id, Post.id != post.id, Post.published == True)
+        .order_by(Post.created_at.desc())
         .limit(3)
         .all()
     )
-    return jsonify([p.to_dict() for p in related]), 200
+    return jsonify([p.to_summary_dict() for p in related]), 200
+
+
+@app.route('/categories/stats', methods=['GET'])
+def get_category_stats():
+    # Read from the category_stats summary that post writes keep current (see stats.py)
+    return jsonify(category_stats()), 200
+
+
+@app.route('/tags/stats', methods=['GET'])
+def get_tag_stats():
+    return jsonify(tag_stats()), 200
+
+
+@app.cli.command('rebuild-related')
+def rebuild_related_command():
+    """Recompute the related-posts index for every post."""
+    count = rebuild_all()
+    print(f"Rebuilt related posts for {count} posts")
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recount the category and tag statistics from the posts."""
+    refresh_stats()
+    print("Rebuilt category and tag statistics")
+
+
+@app.cli.command('check-counts')
+@click.option('--repair', is_flag=True, help="Rewrite the counts that drifted.")
+def check_counts_command(repair):
+    """Compare stored comment and reply counts with the actual rows."""
+    drift = check_counts(repair=repair)
+    action = "Repaired" if repair else "Found"
+    print(f"{action} {drift['posts']} posts and {drift['comments']} comments with wrong counts")
+
+
+@app.cli.command('generate-thumbnails')
+def generate_thumbnails_command():
+    """Render missing image variants for every upload referenced by a post."""
+    images = db.session.execute(
+        db.select(Post.featured_image).where(Post.featured_image.like('/static/uploads/%')).distinct()
+    ).scalars()
+    futures = [thumbnails.generate(image.rsplit('/', 1)[1]) for image in images]
+    futures = [f for f in futures if f is not None]
+    for future in futures:
+        future.result()
+    print(f"Generated variants for {len(futures)} images")
 
 
 class UserResource(Resource):
@@ -218,7 +466,10 @@ class UserResource(Resource):
             return {"error": "Email already registered"}, 409
 
         new_user = User(username=username, email=email)
-        new_user.set_password(password)
+        try:
+            new_user.set_password(password)
+        except HashingUnavailable:
+            return {"error": "Server busy, try again shortly"}, 503, {"Retry-After": "1"}
         db.session.add(new_user)
         db.session.commit()
         return new_user.to_dict(), 201
@@ -231,7 +482,11 @@ class UserResource(Resource):
         if 'email' in data:
             user.email = data['email']
         if 'password' in data:
-            user.set_password(data['password'])
+            try:
+                user.set_password(data['password'])
+            except HashingUnavailable:
+                db.session.rollback()
+                return {"error": "Server busy, try again shortly"}, 503, {"Retry-After": "1"}
         db.session.commit()
         return user.to_dict(), 200
 
@@ -243,11 +498,35 @@ class UserResource(Resource):
 
 class PostResource(Resource):
     def get(self, post_id=None):
+        try:
+            fields = requested_fields(DETAIL_FIELDS if post_id else SUMMARY_FIELDS)
+        except FieldsetError as e:
+            return {"error": str(e)}, 400
+
         if post_id:
-            post = Post.query.options(joinedload(Post.user)).get_or_404(post_id)
-            return post.to_dict(), 200
-        posts = Post.query.options(joinedload(Post.user)).order_by(Post.created_at.desc()).all()
-        return [post.to_dict() for post in posts], 200
+            etag = post_etag(post_id)
+            if etag is None:
+                return {"error": "Post not found"}, 404
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            if fields is None:
+                return post_detail_query().get_or_404(post_id).to_dict(), 200, etag_header(etag)
+            post = post_fieldset_query(fields).get_or_404(post_id)
+            return post.to_fields_dict(fields), 200, etag_header(etag)
+
+        etag = posts_etag()
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        query = post_summary_query() if fields is None else post_fieldset_query(fields)
+        if wants_page():
+            try:
+                return paginate_posts(query, fields), 200, etag_header(etag)
+            except PaginationError as e:
+                return {"error": str(e)}, 400
+        posts, headers = legacy_posts(query, fields)
+        return posts, 200, {**etag_header(etag), **headers}
 
     def post(self):
         try:
@@ -257,7 +536,7 @@ class PostResource(Resource):
             title = data.get('title')
             content = data.get('content')
             excerpt = data.get('excerpt')
-            user_id = data.get('user_id')
+            user_id = current_user_id()
             category_id = data.get('category_id')
             featured_image = data.get('featured_image')
             tag_ids = data.get('tag_ids')
@@ -271,17 +550,12 @@ class PostResource(Resource):
             if not excerpt:
                 return {"error": "Excerpt is required"}, 400
             if not user_id:
-                return {"error": "User ID is required"}, 400
+                return {"error": "Authentication required"}, 401
             if not category_id:
                 return {"error": "Category ID is required"}, 400
             if not tag_ids or not isinstance(tag_ids, list) or len(tag_ids) == 0:
                 return {"error": "At least one tag is required"}, 400
 
-            # ===== Validate user exists =====
-            user = User.query.get(user_id)
-            if not user:
-                return {"error": f"User with ID {user_id} not found"}, 404
-
             # ===== Validate category exists =====
             try:
                 category_id = int(category_id)
@@ -311,11 +585,12 @@ class PostResource(Resource):
                 published=published  # ✅ include published flag
             )
 
-            # Attach tags
-            tags = Tag.query.filter(Tag.id.in_(tag_ids)).all()
-            new_post.tags.extend(tags)
+            # Attach the tags validated above
+            new_post.tags.extend(existing_tags)
 
             db.session.add(new_post)
+            db.session.flush()
+            refresh_neighbors(new_post.id)
             db.session.commit()
 
             return new_post.to_dict(), 201
@@ -329,19 +604,19 @@ class PostResource(Resource):
     def put(self, post_id):
         # Full replace (PUT) - require required fields similar to creation
         post = Post.query.get_or_404(post_id)
+        user_id = current_user_id()  # the author never changes; only they may edit
+        if not user_id:
+            return {"error": "Authentication required"}, 401
+        if post.user_id != user_id:
+            return {"error": "You can only edit your own posts"}, 403
         data = request.get_json() or {}
 
         # Required for full replace
-        required = ['title', 'content', 'excerpt', 'user_id', 'category_id', 'tag_ids']
+        required = ['title', 'content', 'excerpt', 'category_id', 'tag_ids']
         for field in required:
             if field not in data:
                 return {"error": f"{field} is required for PUT"}, 400
 
-        # Validate user
-        user = User.query.get(data['user_id'])
-        if not user:
-            return {"error": f"User with ID {data['user_id']} not found"}, 404
-
         # Validate category
         try:
             category_id = int(data['category_id'])
@@ -364,7 +639,6 @@ class PostResource(Resource):
         post.title = data['title']
         post.content = data['content']
         post.excerpt = data['excerpt']
-        post.user_id = data['user_id']
         post.category_id = category_id
         post.featured_image = data.get('featured_image')
         post.published = bool(data.get('published', False))
@@ -372,19 +646,24 @@ class PostResource(Resource):
         # Replace tags
         post.tags = Tag.query.filter(Tag.id.in_(tag_ids)).all()
 
+        db.session.flush()
+        refresh_neighbors(post.id)
         db.session.commit()
         return post.to_dict(), 200
 
     def patch(self, post_id):
         post = Post.query.get_or_404(post_id)
+        user_id = current_user_id()
+        if not user_id:
+            return {"error": "Authentication required"}, 401
+        if post.user_id != user_id:
+            return {"error": "You can only edit your own posts"}, 403
         data = request.get_json()
 
         if 'title' in data:
             post.title = data['title']
         if 'content' in data:
             post.content = data['content']
-        if 'user_id' in data:
-            post.user_id = data['user_id']
         if 'category_id' in data:
             post.category_id = data['category_id']
         if 'featured_image' in data:
@@ -394,11 +673,20 @@ class PostResource(Resource):
         if 'published' in data:
             post.published = bool(data['published'])  # ✅ allow toggling draft/published
 
+        if 'tag_ids' in data or 'published' in data:
+            db.session.flush()
+            refresh_neighbors(post.id)
         db.session.commit()
         return post.to_dict(), 200
 
     def delete(self, post_id):
         post = Post.query.get_or_404(post_id)
+        user_id = current_user_id()
+        if not user_id:
+            return {"error": "Authentication required"}, 401
+        if post.user_id != user_id:
+            return {"error": "You can only delete your own posts"}, 403
+        refresh_neighbors(post.id, deleted=True)
         db.session.delete(post)
         db.session.commit()
         return {"message": "Post deleted successfully"}, 200
@@ -406,16 +694,21 @@ class PostResource(Resource):
 
 class CommentResource(Resource):
     def get(self, post_id):
-        comments = Comment.query.filter_by(post_id=post_id).all()
-        return [c.to_dict() for c in comments], 200
+        etag = comments_etag(post_id)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        comments = comment_query().filter_by(post_id=post_id).all()
+        return [c.to_dict() for c in comments], 200, etag_header(etag)
 
     def post(self, post_id):
         data = request.get_json()
         content = data.get('content')
-        # accept either user_id or author_id
-        user_id = data.get('user_id') or data.get('author_id')
+        user_id = current_user_id()
 
-        if not content or not user_id:
+        if not user_id:
+            return {"error": "Authentication required"}, 401
+        if not content:
             return {"error": "Missing required fields"}, 400
 
         new_comment = Comment(content=content, user_id=user_id, post_id=post_id)
@@ -423,14 +716,61 @@ class CommentResource(Resource):
         db.session.commit()
         return new_comment.to_dict(), 201
 
+    def delete(self, post_id, comment_id=None):
+        """Delete a comment (and its replies); only its author may."""
+        comment = Comment.query.filter_by(id=comment_id, post_id=post_id).first_or_404()
+        user_id = current_user_id()
+        if not user_id:
+            return {"error": "Authentication required"}, 401
+        if comment.user_id != user_id:
+            return {"error": "You can only delete your own comments"}, 403
+        db.session.delete(comment)
+        db.session.commit()
+        return {"message": "Comment deleted successfully"}, 200
+
+
+class CommentTreeResource(Resource):
+    def get(self, post_id):
+        """One page of top-level comments with their first replies, in two queries."""
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            replies_limit = parse_limit(request.args.get('replies_limit'), default=3, maximum=50)
+            comments, next_cursor = keyset_page(
+                comment_query().filter(Comment.post_id == post_id),
+                Comment, limit, request.args.get('cursor'), descending=False,
+            )
+        except PaginationError as e:
+            return {"error": str(e)}, 400
+
+        replies = replies_for_comments([c.id for c in comments], replies_limit)
+        return {
+            "comments": [
+                {
+                    **comment.to_dict(),
+                    "replies": [reply.to_dict() for reply in replies.get(comment.id, [])],
+                }
+                for comment in comments
+            ],
+            "next_cursor": next_cursor,
+        }, 200
+
 
 class CategoryResource(Resource):
     def get(self, category_id=None):
         if category_id:
+            # Look the row up first so a missing id is a 404, never a 304
             category = Category.query.get_or_404(category_id)
-            return category.to_dict(), 200
+            etag = table_etag(Category)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            return category.to_dict(), 200, etag_header(etag)
+        etag = table_etag(Category)
+        cached = not_modified(etag)
+        if cached:
+            return cached
         categories = Category.query.all()
-        return [cat.to_dict() for cat in categories], 200
+        return [cat.to_dict() for cat in categories], 200, etag_header(etag)
 
     def post(self):
         data = request.get_json()
@@ -447,10 +787,19 @@ class CategoryResource(Resource):
 class TagResource(Resource):
     def get(self, tag_id=None):
         if tag_id:
+            # Look the row up first so a missing id is a 404, never a 304
             tag = Tag.query.get_or_404(tag_id)
-            return tag.to_dict(), 200
+            etag = table_etag(Tag)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+            return tag.to_dict(), 200, etag_header(etag)
+        etag = table_etag(Tag)
+        cached = not_modified(etag)
+        if cached:
+            return cached
         tags = Tag.query.all()
-        return [t.to_dict() for t in tags], 200
+        return [t.to_dict() for t in tags], 200, etag_header(etag)
 
     def post(self):
         data = request.get_json()
@@ -466,25 +815,51 @@ class TagResource(Resource):
         return tag.to_dict(), 201
         
     
+def grouped_replies(comment_ids, per_comment):
+    """Replies for many comments from one IN query, grouped by comment id."""
+    replies = replies_for_comments(comment_ids, per_comment)
+    counts = reply_counts(comment_ids)
+    return {
+        "replies": {str(cid): [r.to_dict() for r in replies.get(cid, [])] for cid in comment_ids},
+        "reply_counts": {str(cid): counts.get(cid, 0) for cid in comment_ids},
+    }
+
+
 class ReplyResource(Resource):
     def get(self):
-        """Fetch all replies for a given comment_id."""
-        comment_id = request.args.get('comment_id')
+        """Fetch replies for one comment_id, or grouped for several (?comment_id=1,2,3)."""
+        raw = request.args.getlist('comment_id')
 
-        if not comment_id:
+        if not raw or not any(raw):
             return {"error": "comment_id is required"}, 400
+        try:
+            comment_ids = parse_comment_ids(raw)
+        except ValueError:
+            return {"error": "comment_id must be a list of integers"}, 400
 
-        replies = Reply.query.filter_by(comment_id=comment_id).all()
-        return [reply.to_dict() for reply in replies], 200
+        if len(raw) == 1 and ',' not in raw[0]:
+            replies = Reply.query.options(joinedload(Reply.user)) \
+                .filter_by(comment_id=comment_ids[0]).order_by(Reply.created_at, Reply.id).all()
+            return [reply.to_dict() for reply in replies], 200
+
+        try:
+            per_comment = parse_limit(request.args.get('limit'))
+        except PaginationError as e:
+            return {"error": str(e)}, 400
+        if len(comment_ids) > MAX_BATCH_COMMENTS:
+            return {"error": f"At most {MAX_BATCH_COMMENTS} comment ids per request"}, 400
+        return grouped_replies(comment_ids, per_comment), 200
 
     def post(self):
         """Create a new reply for a comment."""
         data = request.get_json()
         content = data.get('content')
-        user_id = data.get('user_id')
+        user_id = current_user_id()
         comment_id = data.get('comment_id')
 
-        if not all([content, user_id, comment_id]):
+        if not user_id:
+            return {"error": "Authentication required"}, 401
+        if not all([content, comment_id]):
             return {"error": "Missing required fields"}, 400
 
         new_reply = Reply(
@@ -496,6 +871,38 @@ class ReplyResource(Resource):
         db.session.commit()
         return new_reply.to_dict(), 201
 
+    def delete(self, reply_id=None):
+        """Delete a reply; only its author may."""
+        reply = Reply.query.get_or_404(reply_id)
+        user_id = current_user_id()
+        if not user_id:
+            return {"error": "Authentication required"}, 401
+        if reply.user_id != user_id:
+            return {"error": "You can only delete your own replies"}, 403
+        db.session.delete(reply)
+        db.session.commit()
+        return {"message": "Reply deleted successfully"}, 200
+
+
+class BatchReplyResource(Resource):
+    def post(self):
+        """Same as GET /replies?comment_id=... with the ids in the body: {"comment_ids": [...], "limit": 20}."""
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {"error": "Body must be a JSON object"}, 400
+        try:
+            comment_ids = parse_comment_ids(data.get('comment_ids') or [])
+            per_comment = parse_limit(data.get('limit'))
+        except PaginationError as e:
+            return {"error": str(e)}, 400
+        except (ValueError, TypeError):
+            return {"error": "comment_ids must be a list of integers"}, 400
+        if not comment_ids:
+            return {"error": "comment_ids is required"}, 400
+        if len(comment_ids) > MAX_BATCH_COMMENTS:
+            return {"error": f"At most {MAX_BATCH_COMMENTS} comment ids per request"}, 400
+        return grouped_replies(comment_ids, per_comment), 200
+
 
 
 
@@ -503,11 +910,24 @@ class ReplyResource(Resource):
 
 api.add_resource(UserResource, '/users', '/users/<int:user_id>')
 api.add_resource(PostResource, '/posts', '/posts/<int:post_id>')
-api.add_resource(CommentResource, '/posts/<int:post_id>/comments')
+api.add_resource(CommentResource, '/posts/<int:post_id>/comments', '/posts/<int:post_id>/comments/<int:comment_id>')
+api.add_resource(CommentTreeResource, '/posts/<int:post_id>/comments/tree')
 api.add_resource(ReplyResource, '/replies', '/replies/<int:reply_id>')
+api.add_resource(BatchReplyResource, '/replies/batch')
 api.add_resource(CategoryResource, '/categories', '/categories/<int:category_id>')
 api.add_resource(TagResource, '/tags', '/tags/<int:tag_id>')
 
+# Cached GET endpoints and the data each one embeds
+response_cache.cache_endpoint(
+    'postresource',
+    lambda post_id=None: {f"post:{post_id}", "users", "taxonomy"} if post_id else {"posts", "users", "taxonomy"},
+)
+response_cache.cache_endpoint('get_related_posts', lambda post_id: {"posts", "users", "taxonomy"})
+response_cache.cache_endpoint('categoryresource', lambda category_id=None: {"categories"})
+response_cache.cache_endpoint('tagresource', lambda tag_id=None: {"tags"})
+response_cache.cache_endpoint('get_category_stats', lambda: {"posts", "categories", "taxonomy"})
+response_cache.cache_endpoint('get_tag_stats', lambda: {"posts", "tags", "taxonomy"})
+
 
 if __name__ == '__main__':
     # Ensure upload directory exists before running
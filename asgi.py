@@ -0,0 +1,249 @@
+"""Async ASGI entry point for the read-heavy routes.
+
+    uvicorn asgi:app --port 5556
+
+Serves the GET routes for posts, comments, replies, categories and tags
+with the same JSON as app.py, from an async SQLAlchemy engine over the
+same models. A request waiting on the database gives the event loop to the
+others instead of holding a thread, so one process keeps many concurrent
+slow clients in flight. Everything else stays on the WSGI app: writes,
+uploads, auth, search and the response cache. Run both behind one proxy and
+send GETs for these paths here.
+
+Needs an async driver: aiosqlite for SQLite, asyncpg for Postgres.
+DATABASE_URI is reused with the driver swapped, unless ASYNC_DATABASE_URI
+is set.
+"""
+import os
+import re
+import traceback
+from urllib.parse import parse_qsl
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.datastructures import MultiDict
+from models import Category, Comment, Post, Reply, Tag
+from pagination import LEGACY_PAGE_SIZE, PaginationError, keyset_query, legacy_headers, parse_limit, split_page
+from queries import (
+    DETAIL_FIELDS, MAX_BATCH_COMMENTS, SUMMARY_FIELDS, FieldsetError, detail_options, fieldset_options,
+    group_replies, parse_comment_ids, parse_fieldset, replies_statement, reply_counts_statement,
+    summary_options,
+)
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+    import json
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_uri(uri):
+    """The same database through its async driver."""
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    return url.set(drivername=driver).render_as_string(hide_password=False) if driver else uri
+
+
+# Same database as the WSGI app; connections are shared by every request in this process
+DATABASE_URI = os.environ.get('ASYNC_DATABASE_URI') or async_database_uri(os.environ.get('DATABASE_URI'))
+POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 10))
+
+# Pooled on SQLite too: an aiosqlite connection is a thread, too costly to open per request
+engine = create_async_engine(DATABASE_URI, poolclass=AsyncAdaptedQueuePool, pool_size=POOL_SIZE)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+
+class NotFound(Exception):
+    pass
+
+
+def dumps(data):
+    # Sorted keys like Flask's JSON provider, so both entry points send the same bytes
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) + b"\n"
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode() + b"\n"
+
+
+async def _one(session, statement, what):
+    row = (await session.scalars(statement)).first()
+    if row is None:
+        raise NotFound(f"{what} not found")
+    return row
+
+
+# --- routes ---
+
+async def list_posts(session, args):
+    fields = parse_fieldset(args.get('fields'), args.get('include'), SUMMARY_FIELDS)
+    statement = select(Post).options(*(summary_options() if fields is None else fieldset_options(fields)))
+    render = (lambda post: post.to_summary_dict()) if fields is None else \
+        (lambda post: post.to_fields_dict(fields))
+    if 'limit' in args or 'cursor' in args:
+        limit = parse_limit(args.get('limit'))
+        rows = (await session.scalars(keyset_query(statement, Post, limit, args.get('cursor')))).all()
+        posts, next_cursor = split_page(rows, limit)
+        return {"posts": [render(post) for post in posts], "next_cursor": next_cursor}
+    rows = (await session.scalars(keyset_query(statement, Post, LEGACY_PAGE_SIZE))).all()
+    posts, next_cursor = split_page(rows, LEGACY_PAGE_SIZE)
+    return [render(post) for post in posts], 200, legacy_headers('/posts', args.to_dict(), next_cursor)
+
+
+async def get_post(session, args, post_id):
+    fields = parse_fieldset(args.get('fields'), args.get('include'), DETAIL_FIELDS)
+    if fields is None:
+        post = await _one(session, select(Post).options(*detail_options()).where(Post.id == post_id), "Post")
+        return post.to_dict()
+    post = await _one(session, select(Post).options(*fieldset_options(fields)).where(Post.id == post_id), "Post")
+    return post.to_fields_dict(fields)
+
+
+async def list_comments(session, args, post_id):
+    comments = await session.scalars(
+        select(Comment).options(joinedload(Comment.user)).where(Comment.post_id == post_id)
+    )
+    return [comment.to_dict() for comment in comments]
+
+
+async def comment_tree(session, args, post_id):
+    limit = parse_limit(args.get('limit'))
+    replies_limit = parse_limit(args.get('replies_limit'), default=3, maximum=50)
+    statement = select(Comment).options(joinedload(Comment.user)).where(Comment.post_id == post_id)
+    rows = (await session.scalars(
+        keyset_query(statement, Comment, limit, args.get('cursor'), descending=False)
+    )).all()
+    comments, next_cursor = split_page(rows, limit)
+    replies = {}
+    if comments:
+        replies = group_replies(await session.scalars(replies_statement([c.id for c in comments], replies_limit)))
+    return {
+        "comments": [
+            {**comment.to_dict(), "replies": [reply.to_dict() for reply in replies.get(comment.id, [])]}
+            for comment in comments
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+async def list_replies(session, args):
+    raw = args.getlist('comment_id')
+    if not raw or not any(raw):
+        return {"error": "comment_id is required"}, 400
+    try:
+        comment_ids = parse_comment_ids(raw)
+    except ValueError:
+        return {"error": "comment_id must be a list of integers"}, 400
+
+    if len(raw) == 1 and ',' not in raw[0]:
+        replies = await session.scalars(
+            select(Reply).options(joinedload(Reply.user))
+            .where(Reply.comment_id == comment_ids[0]).order_by(Reply.created_at, Reply.id)
+        )
+        return [reply.to_dict() for reply in replies]
+
+    per_comment = parse_limit(args.get('limit'))
+    if len(comment_ids) > MAX_BATCH_COMMENTS:
+        return {"error": f"At most {MAX_BATCH_COMMENTS} comment ids per request"}, 400
+    replies = group_replies(await session.scalars(replies_statement(comment_ids, per_comment)))
+    counts = dict((await session.execute(reply_counts_statement(comment_ids))).all())
+    return {
+        "replies": {str(cid): [r.to_dict() for r in replies.get(cid, [])] for cid in comment_ids},
+        "reply_counts": {str(cid): counts.get(cid, 0) for cid in comment_ids},
+    }
+
+
+async def list_categories(session, args):
+    return [category.to_dict() for category in await session.scalars(select(Category))]
+
+
+async def get_category(session, args, category_id):
+    return (await _one(session, select(Category).where(Category.id == category_id), "Category")).to_dict()
+
+
+async def list_tags(session, args):
+    return [tag.to_dict() for tag in await session.scalars(select(Tag))]
+
+
+async def get_tag(session, args, tag_id):
+    return (await _one(session, select(Tag).where(Tag.id == tag_id), "Tag")).to_dict()
+
+
+ROUTES = [
+    (re.compile(pattern), handler) for pattern, handler in (
+        (r"/posts", list_posts),
+        (r"/posts/(?P<post_id>\d+)", get_post),
+        (r"/posts/(?P<post_id>\d+)/comments", list_comments),
+        (r"/posts/(?P<post_id>\d+)/comments/tree", comment_tree),
+        (r"/replies", list_replies),
+        (r"/categories", list_categories),
+        (r"/categories/(?P<category_id>\d+)", get_category),
+        (r"/tags", list_tags),
+        (r"/tags/(?P<tag_id>\d+)", get_tag),
+    )
+]
+
+
+# --- ASGI plumbing ---
+
+async def dispatch(method, path, query_string):
+    """(status, body, headers) for one request."""
+    for pattern, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            break
+    else:
+        return 404, {"error": "Not found"}, {}
+    if method not in ('GET', 'HEAD'):
+        return 405, {"error": "Method not allowed"}, {}
+
+    args = MultiDict(parse_qsl(query_string, keep_blank_values=True))
+    params = {name: int(value) for name, value in match.groupdict().items()}
+    try:
+        async with Session() as session:
+            result = await handler(session, args, **params)
+    except (PaginationError, FieldsetError) as e:
+        return 400, {"error": str(e)}, {}
+    except NotFound as e:
+        return 404, {"error": str(e)}, {}
+    except Exception:
+        traceback.print_exc()
+        return 500, {"error": "Internal server error"}, {}
+    if not isinstance(result, tuple):
+        return 200, result, {}
+    body, status, *headers = result
+    return status, body, headers[0] if headers else {}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    status, data, headers = await dispatch(scope['method'], scope['path'], scope['query_string'].decode('latin-1'))
+    body = dumps(data)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            # Same open CORS policy as flask_cors on the WSGI app
+            (b'access-control-allow-origin', b'*'),
+        ] + [(name.lower().encode(), value.encode('latin-1')) for name, value in headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
@@ -0,0 +1,178 @@
+"""Read throughput and latency of the WSGI app against the async ASGI entry point, by concurrency.
+
+    python benchmarks/bench_async.py --posts 20000 --concurrency 1,16,64,256 --json async.json
+
+Seeds a throwaway SQLite database with the seed.py generator, then starts
+gunicorn (sync workers, app:app) and uvicorn (asgi:app) on it and sends each
+the same mix of read requests (posts pages, post detail, comment trees,
+grouped replies, categories) from an asyncio client holding --concurrency
+requests open at a time. Every request uses a fresh connection, so neither
+server gets keep-alive for free. The response cache is off on the WSGI side,
+as it is absent on the ASGI side. Needs gunicorn, uvicorn and aiosqlite.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_endpoints import commit, percentile  # noqa: E402
+
+
+def request_mix(sizes, rng):
+    posts, comments = sizes["posts"], max(sizes["comments"], 1)
+    return rng.choice([
+        "/posts?limit=20",
+        f"/posts/{rng.randint(1, posts)}",
+        f"/posts/{rng.randint(1, posts)}/comments/tree",
+        "/replies?comment_id=" + ",".join(str(rng.randint(1, comments)) for _ in range(10)),
+        "/categories",
+    ])
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(command, port, env):
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{command[0]} exited with {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"{command[0]} did not start listening on {port}")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=30)
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def drive(port, sizes, requests, concurrency, seed):
+    rng = random.Random(seed)
+    paths = [request_mix(sizes, rng) for _ in range(requests)]
+    latencies, errors = [], []
+    queue = iter(paths)
+
+    async def client():
+        for path in queue:
+            start = time.perf_counter()
+            try:
+                status = await fetch(port, path)
+            except OSError:
+                status = 599
+            latencies.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                errors.append(status)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments-per-post', type=float, default=5)
+    parser.add_argument('--replies-per-comment', type=float, default=1)
+    parser.add_argument('--requests', type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument('--concurrency', default='1,16,64,256', help="Comma-separated levels")
+    parser.add_argument('--wsgi-workers', type=int, default=4, help="gunicorn sync worker processes")
+    parser.add_argument('--asgi-workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='blog-bench-async-')
+    database_uri = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['DATABASE_URI'] = database_uri
+    os.environ.setdefault('AUTH_TOKEN_SECRET', 'bench-token-secret')
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+    from flask_migrate import upgrade
+    from app import app
+    from seed import generate
+
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        sizes = generate(users=args.users, posts=args.posts, comments_per_post=args.comments_per_post,
+                         replies_per_comment=args.replies_per_comment, seed=args.seed)
+
+    env = {**os.environ, 'DATABASE_URI': database_uri, 'RESPONSE_CACHE_BACKEND': 'none'}
+    servers = {
+        "wsgi": lambda port: [sys.executable, '-m', 'gunicorn', '-w', str(args.wsgi_workers),
+                              '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+        "asgi": lambda port: [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                              '--workers', str(args.asgi_workers), '--log-level', 'warning',
+                              '--backlog', str(max(2048, max(levels) * 2))],
+    }
+    results = {
+        "meta": {
+            "commit": commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "wsgi_workers": args.wsgi_workers,
+            "asgi_workers": args.asgi_workers,
+            "sizes": sizes,
+        },
+        "modes": {},
+    }
+    print(f"Seeded {sizes}; gunicorn {args.wsgi_workers} sync workers vs uvicorn {args.asgi_workers} worker(s)")
+    for mode, command in servers.items():
+        port = free_port()
+        process = start_server(command(port), port, env)
+        try:
+            asyncio.run(drive(port, sizes, min(50, args.requests), 4, args.seed))  # warm up
+            for concurrency in levels:
+                r = asyncio.run(drive(port, sizes, args.requests, concurrency, args.seed + concurrency))
+                results["modes"].setdefault(mode, {})[str(concurrency)] = r
+                print(f"  {mode} c={concurrency:<4} {r['throughput_rps']:>8} req/s  p50 {r['p50_ms']} ms  "
+                      f"p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  errors {r['errors']}")
+        finally:
+            stop_server(process)
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+"""Throughput and p50/p95/p99 latency of the main API routes.
+
+    python benchmarks/bench_endpoints.py --posts 20000 --requests 500 --json results.json
+    python benchmarks/bench_endpoints.py --server --concurrency 8 --compare results.json
+
+Seeds a throwaway SQLite database with the seed.py generator, then drives
+each route either through the Flask test client (default, one request at a
+time) or through a local threaded WSGI server with --concurrency client
+threads. The response cache is off unless --cache is given, so the numbers
+measure the app rather than cache hits. Results are written as JSON with the
+commit they were taken at; --compare prints the change against an earlier
+file.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_routes(sizes, token, category_id, tag_ids):
+    """name -> function(rng) returning (method, path, json body or None, needs auth)."""
+    posts, comments = sizes["posts"], max(sizes["comments"], 1)
+    return {
+        "GET /posts?limit=20": lambda rng: ("GET", "/posts?limit=20", None, False),
+        "GET /posts/:id": lambda rng: ("GET", f"/posts/{rng.randint(1, posts)}", None, False),
+        "GET /posts/:id/comments": lambda rng: ("GET", f"/posts/{rng.randint(1, posts)}/comments", None, False),
+        "GET /posts/:id/comments/tree": lambda rng: (
+            "GET", f"/posts/{rng.randint(1, posts)}/comments/tree", None, False),
+        "GET /replies?comment_id=(10 ids)": lambda rng: (
+            "GET", "/replies?comment_id=" + ",".join(str(rng.randint(1, comments)) for _ in range(10)),
+            None, False),
+        "GET /posts/:id/related": lambda rng: ("GET", f"/posts/{rng.randint(1, posts)}/related", None, False),
+        "POST /auth/login": lambda rng: (
+            "POST", "/auth/login",
+            {"identifier": f"user{rng.randint(1, sizes['users'])}", "password": "Password123"}, False),
+        "POST /posts": lambda rng: (
+            "POST", "/posts",
+            {"title": f"Benchmark post {rng.random()}", "content": "Benchmark content " * 50,
+             "excerpt": "Benchmark excerpt", "category_id": category_id, "tag_ids": tag_ids}, True),
+    }
+
+
+class TestClientDriver:
+    def __init__(self, app, token):
+        self.client = app.test_client()
+        self.auth = {'Authorization': f'Bearer {token}'}
+
+    def __call__(self, method, path, body, auth):
+        response = self.client.open(path, method=method, json=body, headers=self.auth if auth else None)
+        return response.status_code
+
+
+class ServerDriver:
+    def __init__(self, base, token):
+        self.base = base
+        self.auth = {'Authorization': f'Bearer {token}'}
+
+    def __call__(self, method, path, body, auth):
+        headers = {'Content-Type': 'application/json', **(self.auth if auth else {})}
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                resp.read()
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def run_route(driver, make_request, requests, concurrency, seed):
+    latencies, errors = [], []
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed * 1000 + n)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            method, path, body, auth = make_request(rng)
+            start = time.perf_counter()
+            status = driver(method, path, body, auth)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors.append(status)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    print(f"\nChange against {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for name, current in results["routes"].items():
+        before = baseline["routes"].get(name)
+        if not before:
+            continue
+        deltas = []
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            if before.get(key) and current.get(key) is not None:
+                deltas.append(f"{key} {(current[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"  {name:36} " + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments-per-post', type=float, default=5)
+    parser.add_argument('--replies-per-comment', type=float, default=1)
+    parser.add_argument('--requests', type=int, default=300, help="Requests per route")
+    parser.add_argument('--server', action='store_true', help="Use a local threaded WSGI server")
+    parser.add_argument('--concurrency', type=int, default=4, help="Client threads in --server mode")
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache on")
+    parser.add_argument('--routes', help="Comma-separated substrings; only matching routes run")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='blog-bench-')
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('AUTH_TOKEN_SECRET', 'bench-token-secret')
+    if not args.cache:
+        os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+    from flask_migrate import upgrade
+    from app import app
+    from auth import issue_token
+    from models import Tag
+    from related import rebuild_all
+    from seed import generate
+
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        sizes = generate(users=args.users, posts=args.posts, comments_per_post=args.comments_per_post,
+                         replies_per_comment=args.replies_per_comment, seed=args.seed)
+        rebuild_all()
+        tags = Tag.query.filter_by(category_id=1).limit(2).all()
+    with app.test_request_context():
+        token = issue_token(1)
+
+    routes = build_routes(sizes, token, category_id=1, tag_ids=[t.id for t in tags])
+    if args.routes:
+        wanted = [w.strip() for w in args.routes.split(',')]
+        routes = {name: fn for name, fn in routes.items() if any(w in name for w in wanted)}
+
+    server = None
+    if args.server:
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        driver = ServerDriver(f"http://127.0.0.1:{server.server_port}", token)
+        concurrency = args.concurrency
+    else:
+        driver = TestClientDriver(app, token)
+        concurrency = 1
+
+    results = {
+        "meta": {
+            "commit": commit(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "mode": "server" if args.server else "test_client",
+            "concurrency": concurrency,
+            "cache": args.cache,
+            "sizes": sizes,
+        },
+        "routes": {},
+    }
+    print(f"Seeded {sizes}; {results['meta']['mode']}, concurrency {concurrency}")
+    for n, (name, make_request) in enumerate(routes.items()):
+        run_route(driver, make_request, min(20, args.requests), 1, args.seed + n)  # warm up
+        results["routes"][name] = run_route(driver, make_request, args.requests, concurrency, args.seed + n)
+        r = results["routes"][name]
+        print(f"  {name:36} {r['throughput_rps']:>8} req/s  p50 {r['p50_ms']} ms  "
+              f"p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  errors {r['errors']}")
+
+    if server is not None:
+        server.shutdown()
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Query plans and timings for the hot lookups with and without the composite indexes.
+
+    python benchmarks/bench_indexes.py --posts 200000 --users 5000
+
+Builds a throwaway SQLite database (or uses --database), loads it with
+the synthetic generator in seed.py, then runs every query with the indexes from
+migration 0c4ccaad17b5 dropped and again after recreating them.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+INDEXES = [
+    'ix_posts_user_id_created_at',
+    'ix_posts_category_id_published',
+    'ix_comments_post_id_created_at',
+    'ix_replies_comment_id_created_at',
+    'ix_users_username',
+    'ix_post_tags_tag_id_post_id',
+]
+
+QUERIES = {
+    "my_posts": (
+        "SELECT id FROM posts WHERE user_id = :user_id ORDER BY created_at DESC, id DESC LIMIT 20",
+        lambda rng, size: {"user_id": rng.randint(1, size["users"])},
+    ),
+    "related_posts": (
+        "SELECT id FROM posts WHERE category_id = :category_id AND published = :published "
+        "AND id != :post_id ORDER BY created_at DESC LIMIT 3",
+        lambda rng, size: {"category_id": rng.randint(1, 8), "published": True,
+                           "post_id": rng.randint(1, size["posts"])},
+    ),
+    "post_comments": (
+        "SELECT id, content, user_id FROM comments WHERE post_id = :post_id",
+        lambda rng, size: {"post_id": rng.randint(1, size["posts"])},
+    ),
+    "comment_replies": (
+        "SELECT id, content, user_id FROM replies WHERE comment_id = :comment_id",
+        lambda rng, size: {"comment_id": rng.randint(1, max(size["comments"], 1))},
+    ),
+    "login_lookup": (
+        "SELECT id FROM users WHERE email = :identifier OR username = :identifier LIMIT 1",
+        lambda rng, size: {"identifier": f"user{rng.randint(1, size['users'])}"},
+    ),
+    "posts_by_tag": (
+        "SELECT post_id FROM post_tags WHERE tag_id = :tag_id",
+        lambda rng, size: {"tag_id": rng.randint(1, 96)},
+    ),
+}
+
+
+def explain(db, sql, params):
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+        return [row[-1] for row in rows]
+    rows = db.session.execute(db.text(f"EXPLAIN {sql}"), params).all()
+    return [row[0] for row in rows]
+
+
+def measure(db, size, repeat):
+    results = {}
+    for name, (sql, make_params) in QUERIES.items():
+        rng = random.Random(7)
+        timings = []
+        for _ in range(repeat):
+            params = make_params(rng, size)
+            start = time.perf_counter()
+            db.session.execute(db.text(sql), params).all()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            "plan": explain(db, sql, make_params(random.Random(7), size)),
+            "median_ms": round(statistics.median(timings), 3),
+            "max_ms": round(max(timings), 3),
+        }
+    return results
+
+
+def set_indexes(db, create):
+    tables = {index.name: index for table in db.metadata.tables.values() for index in table.indexes}
+    # Fresh connections afterwards so no cached statement outlives the schema change
+    db.session.remove()
+    with db.engine.begin() as conn:
+        for name in INDEXES:
+            if create:
+                tables[name].create(conn, checkfirst=True)
+            else:
+                tables[name].drop(conn, checkfirst=True)
+        conn.execute(db.text("ANALYZE"))
+    db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help="SQLAlchemy URI; defaults to a temporary SQLite file")
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=50000)
+    parser.add_argument('--comments-per-post', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='blog-bench-')
+    os.environ['DATABASE_URI'] = args.database or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('AUTH_TOKEN_SECRET', 'bench-token-secret')
+
+    from flask_migrate import upgrade
+    from app import app
+    from models import db
+    from seed import generate
+
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        size = generate(users=args.users, posts=args.posts, comments_per_post=args.comments_per_post)
+        print(f"Seeded {size}")
+
+        set_indexes(db, create=False)
+        before = measure(db, size, args.repeat)
+        set_indexes(db, create=True)
+        after = measure(db, size, args.repeat)
+
+    for name in QUERIES:
+        print(f"\n== {name}: {before[name]['median_ms']} ms -> {after[name]['median_ms']} ms (median)")
+        print("   before: " + " | ".join(before[name]["plan"]))
+        print("   after:  " + " | ".join(after[name]["plan"]))
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump({"size": size, "before": before, "after": after}, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Payload size and encode time of GET /posts, by JSON encoder and compression.
+
+    python benchmarks/bench_json.py --posts 20000
+
+Serializes the full GET /posts payload with the old setup (stdlib, pretty
+printed), the stdlib compact and the orjson compact encoders, reports the
+body size raw, gzip'd and (when the brotli package is installed) brotli'd,
+then times the whole request through the test client with each encoder.
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='blog-bench-')
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('AUTH_TOKEN_SECRET', 'bench-token-secret')
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+    from flask_migrate import upgrade
+    from app import app
+    from models import Post
+    from queries import post_summary_query
+    from compression import brotli, compressor
+    import serialization
+    from seed import generate
+
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        generate(users=args.users, posts=args.posts, comments_per_post=0, replies_per_comment=0)
+
+    results = {"posts": args.posts, "encode_ms": {}, "bytes": {}, "request_ms": {}}
+    with app.test_request_context():
+        payload = [p.to_summary_dict() for p in post_summary_query().order_by(Post.created_at.desc()).all()]
+        provider = app.json
+        encoders = {
+            "stdlib_pretty": lambda: json.dumps(payload, indent=2, sort_keys=True).encode(),
+            "stdlib_compact": lambda: json.dumps(payload, separators=(",", ":"), sort_keys=True).encode(),
+        }
+        if serialization.orjson is not None:
+            encoders["orjson_compact"] = lambda: provider._encode(payload, pretty=False)
+        for name, encode in encoders.items():
+            results["encode_ms"][name] = median_ms(encode, args.repeat)
+            results["bytes"][name] = len(encode())
+
+        body = encoders["stdlib_compact"]()
+        results["bytes"]["gzip"] = len(gzip.compress(body, compresslevel=compressor.gzip_level))
+        results["encode_ms"]["gzip"] = median_ms(lambda: compressor.encode(body, 'gzip'), args.repeat)
+        if brotli is not None:
+            results["bytes"]["br"] = len(compressor.encode(body, 'br'))
+            results["encode_ms"]["br"] = median_ms(lambda: compressor.encode(body, 'br'), args.repeat)
+
+    client = app.test_client()
+    saved = serialization.orjson
+    for name, module, compact in (("stdlib_pretty", None, False), ("stdlib_compact", None, True),
+                                  ("orjson_compact", saved, True)):
+        if name.startswith("orjson") and saved is None:
+            continue
+        serialization.orjson = module
+        app.json.compact = compact
+        results["request_ms"][name] = median_ms(lambda: client.get('/posts'), args.repeat)
+        results["request_ms"][name + "_gzip"] = median_ms(
+            lambda: client.get('/posts', headers={'Accept-Encoding': 'gzip'}), args.repeat)
+    serialization.orjson = saved
+    app.json.compact = None
+
+    for section in ("encode_ms", "bytes", "request_ms"):
+        print(section)
+        for name, value in results[section].items():
+            print(f"  {name:24} {value}")
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Login throughput and GET /posts latency while logins hammer the server.
+
+    python benchmarks/bench_login.py --login-threads 16 --seconds 10
+
+Runs the app in a threaded WSGI server twice: once hashing inline on the
+request threads (PASSWORD_HASH_WORKERS=0) and once with the process pool.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+
+def request(url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run_mode(base, users, login_threads, seconds):
+    stop = time.monotonic() + seconds
+    statuses = []
+    latencies = []
+
+    def login_loop(n):
+        i = n
+        while time.monotonic() < stop:
+            i = i % users + 1
+            statuses.append(request(f"{base}/auth/login",
+                                    {"identifier": f"user{i}", "password": "Password123"}))
+
+    def read_loop():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            request(f"{base}/posts?limit=20")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=login_loop, args=(n,)) for n in range(login_threads)]
+    threads.append(threading.Thread(target=read_loop))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        "logins_ok_per_s": round(statuses.count(200) / seconds, 1),
+        "logins_rejected_503": statuses.count(503),
+        "posts_requests": len(latencies),
+        "posts_p50_ms": percentile(latencies, 50),
+        "posts_p95_ms": percentile(latencies, 95),
+        "posts_p99_ms": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=min(os.cpu_count() or 1, 4),
+                        help="Hashing pool size for the pooled run")
+    parser.add_argument('--json', help="Write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='blog-bench-')
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('AUTH_TOKEN_SECRET', 'bench-token-secret')
+    os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+
+    from flask_migrate import upgrade
+    from werkzeug.serving import make_server
+    from app import app
+    from hashing import password_hasher
+    from seed import generate
+
+    users = 200
+    with app.app_context():
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
+        generate(users=users, posts=2000, comments_per_post=2)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    results = {}
+    for mode, workers in (("inline", 0), ("pool", args.workers)):
+        password_hasher.configure(method=app.config['PASSWORD_HASH_METHOD'], workers=workers,
+                                  queue_size=app.config['PASSWORD_HASH_QUEUE'],
+                                  timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+        request(f"{base}/auth/login", {"identifier": "user1", "password": "Password123"})  # warm up
+        results[mode] = run_mode(base, users, args.login_threads, args.seconds)
+        password_hasher.shutdown()
+        print(mode, results[mode])
+
+    server.shutdown()
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Per-request cost of verifying signed access tokens.
+
+    python benchmarks/bench_tokens.py --iterations 100000
+
+Times issue_token/verify_token on their own, then the full load_identity
+before_request hook through the test client against a request with no
+Authorization header.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - start) / iterations * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='blog-bench-')
+    os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault('AUTH_TOKEN_SECRET', 'bench-token-secret')
+
+    from app import app
+    from auth import issue_token, verify_token
+
+    with app.test_request_context():
+        token = issue_token(42)
+        print(f"issue_token:  {per_call_us(lambda: issue_token(42), args.iterations)} us/call")
+        print(f"verify_token: {per_call_us(lambda: verify_token(token), args.iterations)} us/call")
+        bad = token[:-2] + 'xx'
+        print(f"verify_token (bad signature): {per_call_us(lambda: verify_token(bad), args.iterations)} us/call")
+
+    # The welcome route does no work of its own, so the difference is the hook
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    anonymous = per_call_us(lambda: client.get('/'), args.requests)
+    authenticated = per_call_us(lambda: client.get('/', headers=headers), args.requests)
+    print(f"GET / anonymous:     {anonymous} us/request")
+    print(f"GET / with token:    {authenticated} us/request (+{round(authenticated - anonymous, 2)} us)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Bulk post import.
+
+Items are checked field by field first, then every user, category and tag
+they reference is looked up with one IN query per table. The valid posts go
+in through batched Core inserts. Item errors are reported by position, and
+they do not stop the other items from being imported.
+
+Core inserts skip the ORM session events, so this module also invalidates
+the response cache and brings the related-posts index and the category and
+tag statistics up to date itself.
+The FTS index follows through its database triggers as usual.
+"""
+from sqlalchemy import insert, select
+from cache import response_cache
+from models import db, Category, Post, Tag, User, post_tags
+from related import add_posts
+from stats import refresh_stats
+
+BATCH_SIZE = 500
+
+
+def _int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    return int(value)
+
+
+def _check(item, author_id, may_set_user):
+    """Return (row, tag_ids) for a well-formed item; raises ValueError with the message otherwise."""
+    if not isinstance(item, dict):
+        raise ValueError("Item must be a JSON object")
+    for field in ('title', 'content', 'excerpt'):
+        if not item.get(field) or not isinstance(item[field], str):
+            raise ValueError(f"{field.capitalize()} is required")
+
+    user_id = author_id
+    if item.get('user_id') is not None:
+        try:
+            user_id = _int(item['user_id'])
+        except (ValueError, TypeError):
+            raise ValueError("Invalid user ID format")
+        if user_id != author_id and not may_set_user:
+            raise ValueError("Only import administrators may set user_id")
+
+    if item.get('category_id') is None:
+        raise ValueError("Category ID is required")
+    try:
+        category_id = _int(item['category_id'])
+    except (ValueError, TypeError):
+        raise ValueError("Invalid category ID format")
+
+    tag_ids = item.get('tag_ids')
+    if not tag_ids or not isinstance(tag_ids, list):
+        raise ValueError("At least one tag is required")
+    try:
+        tag_ids = sorted({_int(tag_id) for tag_id in tag_ids})
+    except (ValueError, TypeError):
+        raise ValueError("Invalid tag IDs format")
+
+    featured_image = item.get('featured_image')
+    if featured_image is not None and not isinstance(featured_image, str):
+        raise ValueError("Invalid featured_image")
+
+    row = {
+        "title": item['title'],
+        "content": item['content'],
+        "excerpt": item['excerpt'],
+        "user_id": user_id,
+        "category_id": category_id,
+        "featured_image": featured_image,
+        "published": bool(item.get('published', True)),
+    }
+    return row, tag_ids
+
+
+def _existing(column, ids):
+    if not ids:
+        return set()
+    return set(db.session.execute(select(column).where(column.in_(ids))).scalars())
+
+
+def import_posts(items, author_id, may_set_user=False):
+    """Create posts from `items`; returns (created, errors) as lists of {"index", ...} dicts.
+
+    `items` is a list of dicts, or of ValueError instances for entries that could not be parsed.
+    """
+    errors = []
+    checked = []
+    for index, item in enumerate(items):
+        if isinstance(item, ValueError):
+            errors.append({"index": index, "error": str(item)})
+            continue
+        try:
+            checked.append((index, *_check(item, author_id, may_set_user)))
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+
+    users = _existing(User.id, {row["user_id"] for _, row, _ in checked})
+    categories = _existing(Category.id, {row["category_id"] for _, row, _ in checked})
+    tags = _existing(Tag.id, {tag_id for _, _, tag_ids in checked for tag_id in tag_ids})
+
+    valid = []
+    for index, row, tag_ids in checked:
+        if row["user_id"] not in users:
+            errors.append({"index": index, "error": f"User with ID {row['user_id']} not found"})
+        elif row["category_id"] not in categories:
+            errors.append({"index": index, "error": f"Category with ID {row['category_id']} not found"})
+        elif not tags.issuperset(tag_ids):
+            errors.append({"index": index, "error": "One or more tags not found"})
+        else:
+            valid.append((index, row, tag_ids))
+
+    created = []
+    for start in range(0, len(valid), BATCH_SIZE):
+        batch = valid[start:start + BATCH_SIZE]
+        # Ids come back in parameter order: one multi-row INSERT per batch on Postgres;
+        # SQLite cannot guarantee the order, so SQLAlchemy runs the rows one by one there
+        ids = db.session.execute(
+            insert(Post).returning(Post.id, sort_by_parameter_order=True),
+            [row for _, row, _ in batch],
+        ).scalars().all()
+        db.session.execute(insert(post_tags), [
+            {"post_id": post_id, "tag_id": tag_id}
+            for post_id, (_, _, tag_ids) in zip(ids, batch) for tag_id in tag_ids
+        ])
+        created.extend({"index": index, "id": post_id} for post_id, (index, _, _) in zip(ids, batch))
+
+    if not created:
+        db.session.rollback()
+    else:
+        add_posts([post["id"] for post in created])
+        db.session.commit()
+    if created:
+        refresh_stats(  # commits
+            {row["category_id"] for _, row, _ in valid},
+            {tag_id for _, _, tag_ids in valid for tag_id in tag_ids},
+        )
+        response_cache.invalidate("posts")
+
+    errors.sort(key=lambda e: e["index"])
+    return created, errors
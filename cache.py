@@ -0,0 +1,206 @@
+"""Response cache for the read endpoints.
+
+Cached bodies are stored under keys that embed the current version of every
+namespace the endpoint depends on ("posts", "post:12", "categories", ...).
+Committing a change to a model bumps the versions of the namespaces it
+touches, so later reads compute a new key and miss; the stale entries are
+never read again and simply age out of the backend.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from models import User, Post, Comment, Reply, Category, Tag
+
+try:
+    import redis
+except ImportError:  # optional shared backend
+    redis = None
+
+
+class MemoryBackend:
+    """In-process LRU with a per-entry TTL and a cap on the number of entries."""
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, namespaces):
+        with self._lock:
+            return [self._versions.get(ns, 0) for ns in namespaces]
+
+    def bump(self, namespaces):
+        with self._lock:
+            for ns in namespaces:
+                self._versions[ns] = self._versions.get(ns, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class RedisBackend:
+    """Shared backend so every worker process sees the same entries and versions."""
+
+    def __init__(self, url, ttl=60, prefix='blogpost:cache:'):
+        if redis is None:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.setex(self.prefix + key, self.ttl, pickle.dumps(value))
+
+    def versions(self, namespaces):
+        values = self.client.mget([f"{self.prefix}ns:{ns}" for ns in namespaces])
+        return [int(v) if v is not None else 0 for v in values]
+
+    def bump(self, namespaces):
+        pipe = self.client.pipeline()
+        for ns in namespaces:
+            pipe.incr(f"{self.prefix}ns:{ns}")
+        pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def namespaces_for(instance, is_new):
+    """Map a changed model instance to the cache namespaces it invalidates."""
+    if isinstance(instance, Post):
+        return {"posts", f"post:{instance.id}"}
+    if isinstance(instance, Comment):
+        # Comment counts show in the post lists too
+        return {"posts", f"post:{instance.post_id}"}
+    if isinstance(instance, Reply):
+        # Reply counts show in the post and its lists. The counter hook in models.py has
+        # already put the comment in the identity map, so this get does not query
+        comment = object_session(instance).get(Comment, instance.comment_id) if instance.comment_id else None
+        return {"posts", f"post:{comment.post_id}"} if comment is not None else {"posts"}
+    if isinstance(instance, Category):
+        # A new category shows up in /categories; renames also reach embedded post data
+        return {"categories"} if is_new else {"categories", "taxonomy"}
+    if isinstance(instance, Tag):
+        return {"tags"} if is_new else {"tags", "taxonomy"}
+    if isinstance(instance, User) and not is_new:
+        return {"users"}
+    return set()
+
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = None
+        self.endpoints = {}
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_TTL', 60)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        kind = app.config['RESPONSE_CACHE_BACKEND']
+        if kind == 'redis':
+            self.backend = RedisBackend(app.config['RESPONSE_CACHE_REDIS_URL'],
+                                        ttl=app.config['RESPONSE_CACHE_TTL'])
+        elif kind == 'memory':
+            self.backend = MemoryBackend(max_entries=app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+                                         ttl=app.config['RESPONSE_CACHE_TTL'])
+        else:
+            self.backend = None
+            return
+
+        app.before_request(self._serve_cached)
+        app.after_request(self._store)
+        event.listen(Session, 'after_flush', self._collect)
+        event.listen(Session, 'after_commit', self._publish)
+        event.listen(Session, 'after_rollback', self._discard)
+
+    def cache_endpoint(self, endpoint, namespaces):
+        """Cache GET responses of `endpoint`; `namespaces(**view_args)` lists what they depend on."""
+        self.endpoints[endpoint] = namespaces
+
+    def invalidate(self, *namespaces):
+        """For writes that bypass the ORM session (Core bulk inserts and the like)."""
+        if self.backend is not None and namespaces:
+            self.backend.bump(namespaces)
+
+    def _key(self):
+        namespaces = sorted(self.endpoints[request.endpoint](**(request.view_args or {})))
+        versions = self.backend.versions(namespaces)
+        query = urlencode(sorted(request.args.items(multi=True)))
+        stamp = ','.join(f"{ns}={v}" for ns, v in zip(namespaces, versions))
+        return f"{request.path}?{query}|{stamp}"
+
+    def _serve_cached(self):
+        if request.method != 'GET' or request.endpoint not in self.endpoints:
+            return None
+        g.response_cache_key = self._key()
+        cached = self.backend.get(g.response_cache_key)
+        if cached is None:
+            return None
+        g.response_cache_hit = True
+        status, headers, body = cached
+        response = current_app.response_class(body, status=status, headers=headers)
+        response.headers['X-Cache'] = 'HIT'
+        return response.make_conditional(request)
+
+    def _store(self, response):
+        key = g.pop('response_cache_key', None)
+        if key is None or g.pop('response_cache_hit', False):
+            return response
+        if response.status_code == 200 and not response.direct_passthrough:
+            headers = [(k, v) for k, v in response.headers if k.lower() in ('content-type', 'etag', 'deprecation', 'link')]
+            self.backend.set(key, (response.status_code, headers, response.get_data()))
+            response.headers['X-Cache'] = 'MISS'
+        return response
+
+    def _collect(self, session, flush_context):
+        pending = session.info.setdefault('cache_namespaces', set())
+        for instance in session.new:
+            pending |= namespaces_for(instance, is_new=True)
+        for instance in list(session.dirty) + list(session.deleted):
+            pending |= namespaces_for(instance, is_new=False)
+
+    def _publish(self, session):
+        pending = session.info.pop('cache_namespaces', None)
+        if pending:
+            self.invalidate(*pending)
+
+    def _discard(self, session):
+        session.info.pop('cache_namespaces', None)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,63 @@
+"""Negotiated gzip/brotli compression of API responses.
+
+Text and JSON bodies of at least COMPRESS_MIN_SIZE bytes are compressed with
+brotli when the client accepts it and the `brotli` package is installed, and
+with gzip otherwise. File responses (uploads) are left alone: they stream
+from disk, and images are already compressed.
+"""
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+
+class Compressor:
+    def __init__(self):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 4)
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        app.after_request(self._compress)
+
+    def choose(self, accept_encodings):
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def encode(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _compress(self, response):
+        if (self.min_size < 0 or response.status_code != 200 or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE):
+            return response
+        response.vary.add('Accept-Encoding')
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        encoding = self.choose(request.accept_encodings)
+        if encoding is None:
+            return response
+        response.set_data(self.encode(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+compressor = Compressor()
@@ -0,0 +1,64 @@
+"""Cheap validators for conditional GETs.
+
+Each validator is a single aggregate over indexed columns, so a matching
+If-None-Match is answered with 304 before any row is loaded or serialized.
+Post.updated_at also moves when the post's owner, category or tags are
+renamed (see models.touch_updated_posts); comment authors are joined per post.
+"""
+import hashlib
+from flask import current_app, request
+from sqlalchemy import func, select
+from werkzeug.http import quote_etag
+from models import db, Comment, Post, User
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:20]
+
+
+def comment_authors(post_id):
+    """Latest updated_at among the authors of a post's comments, joined through its comments only."""
+    return (
+        select(func.max(User.updated_at))
+        .join(Comment, Comment.user_id == User.id)
+        .where(Comment.post_id == post_id)
+        .scalar_subquery()
+    )
+
+
+def post_etag(post_id):
+    """None when the post does not exist."""
+    row = db.session.query(Post.updated_at, comment_authors(post_id)).filter(Post.id == post_id).first()
+    return make_etag('post', post_id, *row) if row else None
+
+
+def posts_etag():
+    count, latest = db.session.query(func.count(Post.id), func.max(Post.updated_at)).one()
+    return make_etag('posts', count, latest)
+
+
+def comments_etag(post_id):
+    # The post's updated_at moves with reply changes, which alter the comments' reply_count
+    updated_at = db.session.query(Post.updated_at).filter(Post.id == post_id).scalar_subquery()
+    row = db.session.query(func.count(Comment.id), func.max(Comment.id), updated_at, comment_authors(post_id)) \
+        .filter(Comment.post_id == post_id).one()
+    return make_etag('comments', post_id, *row)
+
+
+def table_etag(model):
+    """For small tables whose rows embed nothing else, such as categories and tags."""
+    count, latest = db.session.query(func.count(model.id), func.max(model.updated_at)).one()
+    return make_etag(model.__tablename__, count, latest)
+
+
+def etag_header(etag):
+    return {'ETag': quote_etag(etag, weak=True)}
+
+
+def not_modified(etag):
+    """A 304 response when the client already holds `etag`, else None."""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,100 @@
+"""Consistency check for the denormalized comment and reply counters.
+
+Post.comment_count, Post.reply_count and Comment.reply_count are kept current
+by a session hook in models.py. Writes that go around the ORM (raw SQL, Core
+deletes, restores from backup) can leave them wrong. check_counts() walks both
+tables in id ranges of CHUNK_SIZE, comparing each stored count with a fresh
+COUNT of the child rows, and with repair=True rewrites the ones that drifted.
+"""
+from datetime import datetime
+from sqlalchemy import and_, func, or_, select, update
+from cache import response_cache
+from models import db, Comment, Post, Reply
+
+CHUNK_SIZE = 5000
+
+
+def _actual_comment_replies():
+    return select(func.count(Reply.id)).where(Reply.comment_id == Comment.id).scalar_subquery()
+
+
+def _actual_post_comments():
+    return select(func.count(Comment.id)).where(Comment.post_id == Post.id).scalar_subquery()
+
+
+def _actual_post_replies():
+    # Summing the comments' stored counts would hide drift in them; count the replies themselves
+    return (
+        select(func.count(Reply.id))
+        .join(Comment, Reply.comment_id == Comment.id)
+        .where(Comment.post_id == Post.id)
+        .scalar_subquery()
+    )
+
+
+def _ranges(model, chunk_size):
+    low, high = db.session.execute(select(func.min(model.id), func.max(model.id))).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, chunk_size):
+        yield and_(model.id >= start, model.id < start + chunk_size)
+
+
+def _check_comments(repair, chunk_size):
+    drifted, touched_posts = 0, set()
+    for in_range in _ranges(Comment, chunk_size):
+        rows = db.session.execute(
+            select(Comment.id, Comment.post_id)
+            .where(in_range, Comment.reply_count != _actual_comment_replies())
+        ).all()
+        drifted += len(rows)
+        if repair and rows:
+            # Recounted inside the UPDATE, so replies added since the check are not lost
+            db.session.execute(
+                update(Comment).where(Comment.id.in_([r.id for r in rows]))
+                .values(reply_count=_actual_comment_replies())
+                .execution_options(synchronize_session=False)
+            )
+            touched_posts.update(r.post_id for r in rows)
+            db.session.commit()
+    return drifted, touched_posts
+
+
+def _check_posts(repair, chunk_size):
+    drifted, touched_posts = 0, set()
+    for in_range in _ranges(Post, chunk_size):
+        ids = db.session.execute(
+            select(Post.id).where(in_range, or_(
+                Post.comment_count != _actual_post_comments(),
+                Post.reply_count != _actual_post_replies(),
+            ))
+        ).scalars().all()
+        drifted += len(ids)
+        if repair and ids:
+            db.session.execute(
+                update(Post).where(Post.id.in_(ids))
+                .values(comment_count=_actual_post_comments(), reply_count=_actual_post_replies())
+                .execution_options(synchronize_session=False)
+            )
+            touched_posts.update(ids)
+            db.session.commit()
+    return drifted, touched_posts
+
+
+def check_counts(repair=False, chunk_size=CHUNK_SIZE):
+    """Count (and optionally fix) drifted rows; returns {"comments": n, "posts": n}."""
+    comments, touched = _check_comments(repair, chunk_size)
+    posts, touched_by_posts = _check_posts(repair, chunk_size)
+    touched |= touched_by_posts
+    if touched:
+        # The counts are part of the post representations: move their ETags and drop cached copies
+        ids = sorted(touched)
+        for start in range(0, len(ids), chunk_size):
+            db.session.execute(
+                update(Post).where(Post.id.in_(ids[start:start + chunk_size]))
+                .values(updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        response_cache.invalidate("posts", *(f"post:{post_id}" for post_id in ids))
+    return {"comments": comments, "posts": posts}
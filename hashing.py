@@ -0,0 +1,89 @@
+"""Password hashing off the request thread.
+
+scrypt/PBKDF2 is deliberately slow. Running it inline lets a burst of logins
+occupy every worker thread, so hashing runs in a small process pool instead.
+A bounded number of jobs may be queued or running; past that, or past the
+timeout, callers get HashingUnavailable and the request fails fast with 503
+instead of stalling unrelated reads.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingUnavailable(RuntimeError):
+    """The hashing pool is saturated or did not answer in time."""
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, queue_size=8, timeout=5.0):
+        self.configure(method=method, workers=workers, queue_size=queue_size, timeout=timeout)
+
+    def configure(self, method, workers, queue_size, timeout):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(queue_size, 1))
+        self._executor = None
+        self._owner_pid = None
+        self._lock = threading.Lock()
+        self._prefix = None
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(os.cpu_count() or 1, 4))
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 16)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 5.0)
+        self.configure(
+            method=app.config['PASSWORD_HASH_METHOD'],
+            workers=app.config['PASSWORD_HASH_WORKERS'],
+            queue_size=app.config['PASSWORD_HASH_QUEUE'],
+            timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+        )
+
+    def _pool(self):
+        # Created lazily and per process, so gunicorn's forked workers each get their own
+        with self._lock:
+            if self._executor is None or self._owner_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._owner_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingUnavailable("Password hashing queue is full")
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingUnavailable("Password hashing timed out")
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when pwhash was made with a different method or cost than the configured one."""
+        if self._prefix is None:
+            # werkzeug fills in default costs ("scrypt" -> "scrypt:32768:8:1"); learn them once
+            self._prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._prefix
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._owner_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,104 @@
+"""Opt-in per-request SQL instrumentation.
+
+With SQL_INSTRUMENTATION on, every request gets a Server-Timing header:
+  - db: statement count and time spent in the database
+  - serialize: time spent encoding JSON
+  - app: everything else
+  - total
+When one statement shape (the SQL with its IN lists collapsed) runs more than
+SQL_N_PLUS_ONE_THRESHOLD times in a request, a warning naming the route and
+the statement is logged. That is the signature of a lazy load inside a loop
+such as Post.to_dict over a list.
+
+Off by default: the engine hooks cost a few microseconds per statement.
+"""
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from models import db
+
+# "IN (?, ?, ?)" and "IN (%(p_1)s, ...)" both become "IN (...)" so batch sizes do not split a shape
+IN_LIST = re.compile(r"IN \((?:[^()]*?)\)", re.IGNORECASE)
+WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement):
+    return WHITESPACE.sub(' ', IN_LIST.sub('IN (...)', statement)).strip()
+
+
+class SQLInstrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 10
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_INSTRUMENTATION', False)
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 10)
+        self.enabled = app.config['SQL_INSTRUMENTATION']
+        self.threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        if not self.enabled:
+            return
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor)
+        self._time_serialization(app)
+        # Register before the cache and compression hooks so the total covers them too
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _time_serialization(self, app):
+        # jsonify and the Flask-RESTful representation both end in app.json.response
+        provider = app.json
+        encode = provider.response
+
+        def timed_response(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return encode(*args, **kwargs)
+            finally:
+                if 'sql_stats' in g:
+                    g.sql_stats['serialize'] += time.perf_counter() - start
+
+        provider.response = timed_response
+
+    def _start(self):
+        g.sql_stats = {"started": time.perf_counter(), "count": 0, "db": 0.0, "serialize": 0.0,
+                       "shapes": Counter()}
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        if not has_request_context() or 'sql_stats' not in g:
+            return
+        stats = g.sql_stats
+        stats["count"] += 1
+        stats["db"] += elapsed
+        stats["shapes"][statement_shape(statement)] += 1
+
+    def _finish(self, response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - stats["started"]
+        app_time = max(total - stats["db"] - stats["serialize"], 0.0)
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={stats["db"] * 1000:.2f};desc="{stats["count"]} queries"',
+            f'serialize;dur={stats["serialize"] * 1000:.2f}',
+            f'app;dur={app_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+        for shape, count in stats["shapes"].items():
+            if count > self.threshold:
+                current_app.logger.warning(
+                    "Possible N+1: %s %s ran the same statement %d times: %s",
+                    request.method, request.url_rule.rule if request.url_rule else request.path,
+                    count, shape[:300],
+                )
+        return response
+
+
+sql_instrumentation = SQLInstrumentation()
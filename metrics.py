@@ -0,0 +1,233 @@
+"""Request metrics in the Prometheus text format, served at /metrics.
+
+Recording a request is a few dict updates under a lock. Routes are labelled
+by their registered pattern (`/posts/<int:post_id>`), never the raw path, so
+the number of series stays bounded.
+
+Each process keeps its own numbers. With METRICS_DIR set, every process also
+writes a snapshot of them to `<METRICS_DIR>/metrics-<pid>.json`, at most
+once per METRICS_FLUSH_INTERVAL seconds and at exit. A scrape of any worker
+then merges all snapshots. Counters and histograms from exited workers are
+kept, so totals never go backwards. Gauges (in-flight requests, pool usage)
+only count live processes. Other workers' numbers can be up to one flush
+interval old.
+"""
+import atexit
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from flask import g, request
+from models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HELP = {
+    "http_requests_total": ("counter", "Requests handled, by method, route pattern and status."),
+    "http_request_duration_seconds": ("histogram", "Request latency, by method and route pattern."),
+    "http_response_size_bytes": ("histogram", "Response body size as sent, by method and route pattern."),
+    "http_requests_in_flight": ("gauge", "Requests being handled right now."),
+    "db_pool_checked_out": ("gauge", "Database connections in use."),
+    "db_pool_size": ("gauge", "Database connections the pool keeps open."),
+    "db_pool_overflow": ("gauge", "Database connections open beyond the pool size."),
+    "upload_bytes_total": ("counter", "Bytes received in image uploads."),
+    "uploads_total": ("counter", "Image uploads, by whether they stored a new file."),
+}
+BUCKETS = {
+    "http_request_duration_seconds": LATENCY_BUCKETS,
+    "http_response_size_bytes": SIZE_BUCKETS,
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _dump_key(key):
+    """Series keys as stored in the snapshot files."""
+    return json.dumps([key[0], key[1]])
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.in_flight = 0
+        self.directory = None
+        self.flush_interval = 1.0
+        self._last_flush = 0.0
+        self._engine = None
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_INTERVAL', 1.0)
+        self.directory = app.config['METRICS_DIR']
+        self.flush_interval = app.config['METRICS_FLUSH_INTERVAL']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(self.flush)
+        with app.app_context():
+            self._engine = db.engine
+        # Register early: the timing then covers the other hooks, and the size is what gets sent
+        app.before_request(self._start)
+        app.after_request(self._record)
+        app.teardown_request(self._done)
+
+    # --- recording ---
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self.counters[_key(name, labels)] += amount
+
+    def observe(self, name, labels, value):
+        buckets = BUCKETS[name]
+        key = _key(name, labels)
+        with self._lock:
+            series = self.histograms.get(key)
+            if series is None:
+                # One count per bucket, then +Inf, sum
+                series = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-1] += value
+
+    def record_upload(self, size, created):
+        self.inc("upload_bytes_total", {}, size)
+        self.inc("uploads_total", {"result": "created" if created else "deduplicated"})
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+    def _record(self, response):
+        started = g.get('metrics_started')
+        if started is None or request.endpoint == 'metrics':
+            return response
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        labels = {"method": request.method, "route": route}
+        self.inc("http_requests_total", {**labels, "status": str(response.status_code)})
+        self.observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+        if response.content_length is not None:
+            self.observe("http_response_size_bytes", labels, response.content_length)
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return response
+
+    def _done(self, exc=None):
+        if g.pop('metrics_started', None) is not None:
+            with self._lock:
+                self.in_flight -= 1
+
+    # --- multiprocess snapshots ---
+
+    def _gauges(self):
+        gauges = {_key("http_requests_in_flight", {}): self.in_flight}
+        pool = self._engine.pool if self._engine is not None else None
+        for name, method in (("db_pool_checked_out", "checkedout"), ("db_pool_size", "size"),
+                             ("db_pool_overflow", "overflow")):
+            if hasattr(pool, method):
+                gauges[_key(name, {})] = max(getattr(pool, method)(), 0)
+        return gauges
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "counters": {_dump_key(k): v for k, v in self.counters.items()},
+                "histograms": {_dump_key(k): list(v) for k, v in self.histograms.items()},
+                "gauges": {_dump_key(k): v for k, v in self._gauges().items()},
+            }
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        data = self.snapshot()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(data, fh)
+        os.replace(tmp, os.path.join(self.directory, f"metrics-{data['pid']}.json"))
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue  # being replaced right now
+        return snapshots
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    # --- exposition ---
+
+    def render(self):
+        counters, histograms, gauges = defaultdict(float), {}, defaultdict(float)
+        for snap in self._snapshots():
+            for key, value in snap["counters"].items():
+                counters[key] += value
+            for key, series in snap["histograms"].items():
+                merged = histograms.setdefault(key, [0] * len(series))
+                for i, value in enumerate(series):
+                    merged[i] += value
+            if snap["pid"] == os.getpid() or self._alive(snap["pid"]):
+                for key, value in snap["gauges"].items():
+                    gauges[key] += value
+
+        by_name = defaultdict(list)
+        for source in (counters, histograms, gauges):
+            for key, value in source.items():
+                name, labels = json.loads(key)
+                by_name[name].append((labels, value))
+
+        lines = []
+        for name, (kind, help_text) in HELP.items():
+            series = by_name.get(name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series, key=lambda s: s[0]):
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS[name] + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
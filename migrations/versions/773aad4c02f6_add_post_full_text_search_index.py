@@ -0,0 +1,71 @@
+"""add post full text search index
+
+Revision ID: 773aad4c02f6
+Revises: 58715b06eae2
+Create Date: 2026-10-18 01:12:44.251373
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '773aad4c02f6'
+down_revision = '58715b06eae2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # External-content FTS5 table over posts, kept in sync by triggers
+        op.execute("""
+            CREATE VIRTUAL TABLE posts_fts USING fts5(
+                title, excerpt, content,
+                content='posts', content_rowid='id', tokenize='porter unicode61'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER posts_fts_ai AFTER INSERT ON posts BEGIN
+                INSERT INTO posts_fts(rowid, title, excerpt, content)
+                VALUES (new.id, new.title, new.excerpt, new.content);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER posts_fts_ad AFTER DELETE ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, excerpt, content)
+                VALUES ('delete', old.id, old.title, old.excerpt, old.content);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER posts_fts_au AFTER UPDATE OF title, excerpt, content ON posts BEGIN
+                INSERT INTO posts_fts(posts_fts, rowid, title, excerpt, content)
+                VALUES ('delete', old.id, old.title, old.excerpt, old.content);
+                INSERT INTO posts_fts(rowid, title, excerpt, content)
+                VALUES (new.id, new.title, new.excerpt, new.content);
+            END
+        """)
+        op.execute("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        # Generated column: Postgres recomputes it on every INSERT and UPDATE
+        op.execute("""
+            ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(excerpt, '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(content, '')), 'C')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX ix_posts_search_vector ON posts USING GIN (search_vector)")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS posts_fts_ai")
+        op.execute("DROP TABLE IF EXISTS posts_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_posts_search_vector")
+        op.execute("ALTER TABLE posts DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,57 @@
+"""add comment and reply counts
+
+Revision ID: 9b51d3e0c7a4
+Revises: 6336e2aa0d02
+Create Date: 2026-10-18 01:52:40.118734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b51d3e0c7a4'
+down_revision = '6336e2aa0d02'
+branch_labels = None
+depends_on = None
+
+# Rows per backfill UPDATE; each chunk is its own short statement instead of one table-wide rewrite
+CHUNK_SIZE = 5000
+
+
+def _backfill(table, assignments):
+    bind = op.get_bind()
+    low, high = bind.execute(sa.text(f"SELECT MIN(id), MAX(id) FROM {table}")).one()
+    if low is None:
+        return
+    for start in range(low, high + 1, CHUNK_SIZE):
+        bind.execute(
+            sa.text(f"UPDATE {table} SET {assignments} WHERE id >= :start AND id < :end"),
+            {"start": start, "end": start + CHUNK_SIZE},
+        )
+
+
+def upgrade():
+    # Plain ADD COLUMN with a constant default: no table rebuild, so the posts FTS triggers stay
+    op.add_column('posts', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('posts', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('comments', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+
+    _backfill('comments', "reply_count = (SELECT COUNT(*) FROM replies WHERE replies.comment_id = comments.id)")
+    _backfill('posts', "comment_count = (SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id), "
+                       "reply_count = (SELECT COALESCE(SUM(comments.reply_count), 0) FROM comments "
+                       "WHERE comments.post_id = posts.id)")
+
+
+def _drop_column(table, column):
+    if op.get_bind().dialect.name == 'sqlite':
+        # Batch mode would rebuild the table and lose the FTS triggers; SQLite 3.35+ drops in place
+        op.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+    else:
+        op.drop_column(table, column)
+
+
+def downgrade():
+    _drop_column('comments', 'reply_count')
+    _drop_column('posts', 'reply_count')
+    _drop_column('posts', 'comment_count')
@@ -1,7 +1,11 @@
+from collections import Counter, defaultdict
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, select, update
 from sqlalchemy_serializer import SerializerMixin
-from sqlalchemy.orm import validates
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import Session, validates
+from hashing import password_hasher
+from thumbnails import thumbnails
 
 
 db = SQLAlchemy() 
@@ -10,17 +14,21 @@ db = SQLAlchemy()
 post_tags = db.Table(
     'post_tags',
     db.Column('post_id', db.Integer, db.ForeignKey('posts.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True),
+    # The primary key leads with post_id; lookups by tag need the reverse order
+    db.Index('ix_post_tags_tag_id_post_id', 'tag_id', 'post_id'),
 )
 
 class User(db.Model):
     __tablename__ = 'users'
 
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), nullable=False)
+    username = db.Column(db.String(100), nullable=False, index=True)
     email = db.Column(db.String(120), nullable=False, unique=True, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    # Moved by touch_updated_posts when a field shown in post and comment bodies changes; feeds their ETags
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     # Relationships
     posts = db.relationship('Post', back_populates='user', cascade='all, delete-orphan')
@@ -36,10 +44,10 @@ class User(db.Model):
     def set_password(self, password):
         if len(password) < 8:
             raise ValueError('Password must be at least 8 characters long')
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def to_dict(self):
         return {
@@ -57,6 +65,7 @@ class Category(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     posts = db.relationship('Post', back_populates='category', cascade='all, delete-orphan')
     tags = db.relationship('Tag', back_populates='category', cascade='all, delete-orphan')
@@ -76,6 +85,7 @@ class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     category = db.relationship('Category', back_populates='tags')
     posts = db.relationship('Post', secondary=post_tags, back_populates='tags')
@@ -102,12 +112,42 @@ class Post(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
     published = db.Column(db.Boolean, nullable=False, default=False)
+    # Bumped on every change to the post, its tags or its comments; drives ETags
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # Denormalized; kept current by count_comments_and_replies, repaired by `flask check-counts`
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     user = db.relationship('User', back_populates='posts')
     category = db.relationship('Category', back_populates='posts')
     tags = db.relationship('Tag', secondary=post_tags, back_populates='posts')
     comments = db.relationship('Comment', back_populates='post', cascade='all, delete-orphan')
 
+    # Keyset pagination walks posts newest-first on (created_at, id)
+    __table_args__ = (
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_posts_user_id_created_at', 'user_id', 'created_at', 'id'),
+        db.Index('ix_posts_category_id_published', 'category_id', 'published', 'created_at'),
+    )
+
+    # Everything ?fields= and ?include= can select on a post, and how each is rendered
+    FIELDS = {
+        "id": lambda post: post.id,
+        "title": lambda post: post.title,
+        "excerpt": lambda post: post.excerpt,
+        "content": lambda post: post.content,
+        "featured_image": lambda post: post.featured_image,
+        "featured_image_variants": lambda post: thumbnails.variant_urls(post.featured_image),
+        "created_at": lambda post: post.created_at.isoformat() if post.created_at else None,
+        "published": lambda post: post.published,
+        "comment_count": lambda post: post.comment_count,
+        "reply_count": lambda post: post.reply_count,
+        "owner": lambda post: post.user.to_dict() if post.user else None,
+        "category": lambda post: post.category.to_dict() if post.category else None,
+        "tags": lambda post: [tag.to_dict() for tag in post.tags],
+        "comments": lambda post: [comment.to_dict() for comment in post.comments],
+    }
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -115,14 +155,38 @@ class Post(db.Model):
             "excerpt": self.excerpt,
             "content": self.content,
             "featured_image": self.featured_image,
+            "featured_image_variants": thumbnails.variant_urls(self.featured_image),
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "published": self.published,
+            "comment_count": self.comment_count,
+            "reply_count": self.reply_count,
             "owner": self.user.to_dict() if self.user else None,  
             "category": self.category.to_dict() if self.category else None,  
             "tags": [tag.to_dict() for tag in self.tags] if self.tags else [],
             "comments": [comment.to_dict() for comment in self.comments] if self.comments else []
         }
 
+    def to_summary_dict(self):
+        """Lean shape for collection endpoints: no content, no comments."""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "excerpt": self.excerpt,
+            "featured_image": self.featured_image,
+            "featured_image_variants": thumbnails.variant_urls(self.featured_image),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "published": self.published,
+            "comment_count": self.comment_count,
+            "reply_count": self.reply_count,
+            "owner": self.user.to_dict() if self.user else None,
+            "category": self.category.to_dict() if self.category else None,
+            "tags": [tag.to_dict() for tag in self.tags],
+        }
+
+    def to_fields_dict(self, fields):
+        """Only the requested FIELDS; relationships that were not asked for are never touched."""
+        return {name: self.FIELDS[name](self) for name in fields}
+
     def __repr__(self):
         return f"<Post {self.id} - {self.title}>"
 
@@ -134,18 +198,24 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     user = db.relationship('User', back_populates='comments')
     post = db.relationship('Post', back_populates='comments')
     replies = db.relationship('Reply', back_populates='comment', cascade='all, delete-orphan')  # Add this
 
+    __table_args__ = (
+        db.Index('ix_comments_post_id_created_at', 'post_id', 'created_at', 'id'),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
             "content": self.content,
             "created_at": self.created_at.isoformat(),
             "author": self.user.to_dict() if self.user else None,
-            "post_id": self.post_id
+            "post_id": self.post_id,
+            "reply_count": self.reply_count,
         }
 
     def __repr__(self):
@@ -163,6 +233,10 @@ class Reply(db.Model):
     user = db.relationship('User', back_populates='replies')
     comment = db.relationship('Comment', back_populates='replies')  # Use back_populates for consistency
 
+    __table_args__ = (
+        db.Index('ix_replies_comment_id_created_at', 'comment_id', 'created_at', 'id'),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -174,3 +248,148 @@ class Reply(db.Model):
 
     def __repr__(self):
         return f"<Reply {self.id} - Comment {self.comment_id} - User {self.user_id}>"
+
+class PostNeighbor(db.Model):
+    """Precomputed related posts: the best-ranked published posts sharing tags with post_id."""
+    __tablename__ = 'post_neighbors'
+
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)  # Jaccard overlap of the two tag sets
+    rank = db.Column(db.Float, nullable=False)   # score plus a recency term, used for ordering
+
+    __table_args__ = (
+        db.Index('ix_post_neighbors_post_id_rank', 'post_id', 'rank'),
+        db.Index('ix_post_neighbors_neighbor_id', 'neighbor_id'),
+    )
+
+    def __repr__(self):
+        return f"<PostNeighbor {self.post_id} -> {self.neighbor_id} ({self.score:.2f})>"
+
+class CategoryStats(db.Model):
+    """Post counts and latest post times per category, kept current by stats.py."""
+    __tablename__ = 'category_stats'
+
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    published_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    latest_post_at = db.Column(db.DateTime, nullable=True)
+    latest_published_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<CategoryStats {self.category_id} - {self.post_count} posts>"
+
+class TagStats(db.Model):
+    """Post counts and latest post times per tag, kept current by stats.py."""
+    __tablename__ = 'tag_stats'
+
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+    post_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    published_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    latest_post_at = db.Column(db.DateTime, nullable=True)
+    latest_published_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<TagStats {self.tag_id} - {self.post_count} posts>"
+
+
+# Fields of each model that post bodies show; changing one has to move those posts' ETags
+EMBEDDED_FIELDS = {User: ('username', 'email'), Category: ('name',), Tag: ('name', 'category_id')}
+
+
+def _posts_showing(obj):
+    if isinstance(obj, User):
+        return Post.user_id == obj.id
+    if isinstance(obj, Category):
+        return Post.category_id == obj.id
+    return Post.id.in_(select(post_tags.c.post_id).where(post_tags.c.tag_id == obj.id))
+
+
+@event.listens_for(Session, 'before_flush')
+def touch_updated_posts(session, flush_context, instances):
+    """Keep Post.updated_at current, including for tag and comment changes that never UPDATE the posts row.
+
+    Renaming a user, category or tag touches the posts that show it, through the indexed
+    foreign key, so validators never have to aggregate those tables. Comment authors are
+    left to the validators, which join them per post.
+    """
+    now = datetime.utcnow()
+    shown = []
+    with session.no_autoflush:
+        for obj in session.dirty:
+            if isinstance(obj, Post) and session.is_modified(obj):
+                obj.updated_at = now
+            elif type(obj) in EMBEDDED_FIELDS and any(
+                inspect(obj).attrs[field].history.has_changes() for field in EMBEDDED_FIELDS[type(obj)]
+            ):
+                obj.updated_at = now
+                shown.append(obj)
+        for obj in list(session.new) + list(session.deleted):
+            if isinstance(obj, Comment) and obj.post_id is not None:
+                post = session.get(Post, obj.post_id)
+                if post is not None and post not in session.deleted:
+                    post.updated_at = now
+            elif isinstance(obj, Tag) and obj in session.deleted:
+                # Its post_tags rows go with it
+                shown.append(obj)
+        for obj in shown:
+            session.execute(
+                update(Post).where(_posts_showing(obj)).values(updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def _loaded_parent(session, child, relationship, model, foreign_key):
+    """The parent of `child` if the session already holds it, without loading anything."""
+    parent = child.__dict__.get(relationship)
+    if parent is None and foreign_key is not None:
+        parent = session.identity_map.get(session.identity_key(model, foreign_key))
+    return parent
+
+
+@event.listens_for(Session, 'before_flush')
+def count_comments_and_replies(session, flush_context, instances):
+    """Keep comment_count and reply_count in step with the comments and replies being added or deleted.
+
+    Existing rows are changed with `count = count + n` in the flush's own transaction, so
+    concurrent writers cannot lose each other's increments. Parents created in the same
+    flush get their counts set in memory; parents being deleted are left alone.
+    """
+    changes = [(obj, 1) for obj in session.new] + [(obj, -1) for obj in session.deleted]
+    if not any(isinstance(obj, (Comment, Reply)) for obj, _ in changes):
+        return
+    # (model, parent instance or id) -> Counter of column -> delta
+    deltas = defaultdict(Counter)
+
+    with session.no_autoflush:
+        for obj, delta in changes:
+            if isinstance(obj, Comment):
+                post = _loaded_parent(session, obj, 'post', Post, obj.post_id)
+                deltas[Post, post if post is not None else obj.post_id]["comment_count"] += delta
+            elif isinstance(obj, Reply):
+                comment = _loaded_parent(session, obj, 'comment', Comment, obj.comment_id)
+                if comment is None and obj.comment_id is not None:
+                    comment = session.get(Comment, obj.comment_id)
+                if comment is None:
+                    continue
+                deltas[Comment, comment]["reply_count"] += delta
+                post = _loaded_parent(session, comment, 'post', Post, comment.post_id)
+                deltas[Post, post if post is not None else comment.post_id]["reply_count"] += delta
+
+        now = datetime.utcnow()
+        for (model, parent), counts in deltas.items():
+            if parent is None or parent in session.deleted:
+                continue
+            if parent in session.new:
+                for column, delta in counts.items():
+                    setattr(parent, column, (getattr(parent, column) or 0) + delta)
+                continue
+            values = {column: getattr(model, column) + delta for column, delta in counts.items()}
+            if model is Post:
+                # Reply changes show up in the post too, so they move its ETag like comments do
+                values["updated_at"] = now
+            parent_id = parent if isinstance(parent, int) else parent.id
+            session.execute(
+                update(model).where(model.id == parent_id).values(**values)
+                .execution_options(synchronize_session=False)
+            )
@@ -0,0 +1,102 @@
+import base64
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+from sqlalchemy import func, select, tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Requests without limit/cursor get the old bare array, deprecated and cut to this many newest rows
+LEGACY_PAGE_SIZE = MAX_PAGE_SIZE
+
+
+class PaginationError(ValueError):
+    """Raised when a client sends a malformed `limit` or `cursor`."""
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    return min(limit, maximum)
+
+
+def encode_token(values):
+    """Opaque, URL-safe cursor for any list of JSON-serializable sort keys."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_token(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError, AttributeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list):
+        raise PaginationError("Invalid cursor")
+    return values
+
+
+def encode_cursor(created_at, row_id):
+    return encode_token([created_at.isoformat() if created_at else None, row_id])
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, row_id = decode_token(cursor)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+
+
+def keyset_query(query, model, limit, cursor=None, descending=True):
+    """`query` (a Query or a select()) ordered on (created_at, id) and cut to one page plus one row.
+
+    The cursor row's own created_at is re-read by primary key so the comparison
+    happens between stored values (SQLite keeps func.now() defaults without
+    microseconds); the timestamp in the cursor is only used if that row is gone.
+    """
+    order = (model.created_at.desc(), model.id.desc()) if descending \
+        else (model.created_at.asc(), model.id.asc())
+    query = query.order_by(*order)
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        anchor = func.coalesce(
+            select(model.created_at).where(model.id == row_id).scalar_subquery(),
+            created_at,
+        )
+        key = tuple_(model.created_at, model.id)
+        boundary = tuple_(anchor, row_id)
+        query = query.filter(key < boundary if descending else key > boundary)
+
+    return query.limit(limit + 1)
+
+
+def split_page(rows, limit):
+    """The page and the next cursor from the rows a keyset_query returned."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+
+def keyset_page(query, model, limit, cursor=None, descending=True):
+    """Return one page of `query` ordered on (created_at, id) plus the next cursor."""
+    return split_page(keyset_query(query, model, limit, cursor, descending).all(), limit)
+
+
+def legacy_headers(path, args, next_cursor):
+    """Headers for a deprecated bare-array response; a Link to the rest when it was cut short."""
+    headers = {'Deprecation': 'true'}
+    if next_cursor:
+        query = urlencode({**args, 'limit': LEGACY_PAGE_SIZE, 'cursor': next_cursor})
+        headers['Link'] = f'<{path}?{query}>; rel="next"'
+    return headers
@@ -0,0 +1,178 @@
+from collections import defaultdict
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+from models import db, Comment, Post, Reply, User
+
+# Columns needed by Post.to_summary_dict; content is deliberately left out
+SUMMARY_COLUMNS = (
+    Post.id, Post.title, Post.excerpt, Post.featured_image,
+    Post.created_at, Post.published, Post.user_id, Post.category_id,
+    Post.comment_count, Post.reply_count,
+)
+
+
+def summary_options():
+    """Loader options for list views: owner and category joined, tags in one IN query."""
+    return (
+        load_only(*SUMMARY_COLUMNS),
+        joinedload(Post.user).load_only(User.id, User.username, User.email, User.created_at),
+        joinedload(Post.category),
+        selectinload(Post.tags),
+    )
+
+
+def post_summary_query():
+    return Post.query.options(*summary_options())
+
+
+class FieldsetError(ValueError):
+    """Raised for unknown names in ?fields= or ?include=."""
+
+
+DETAIL_FIELDS = frozenset(Post.FIELDS)
+SUMMARY_FIELDS = DETAIL_FIELDS - {"content", "comments"}
+INCLUDABLE = frozenset({"owner", "category", "tags", "comments"})
+
+# Post columns each field reads; id and created_at (the keyset cursor) are always loaded
+FIELD_COLUMNS = {
+    "title": (Post.title,),
+    "excerpt": (Post.excerpt,),
+    "content": (Post.content,),
+    "featured_image": (Post.featured_image,),
+    "featured_image_variants": (Post.featured_image,),
+    "published": (Post.published,),
+    "comment_count": (Post.comment_count,),
+    "reply_count": (Post.reply_count,),
+    "owner": (Post.user_id,),
+    "category": (Post.category_id,),
+}
+
+
+def _names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def parse_fieldset(fields, include, default):
+    """Fields to render for ?fields= and ?include=, or None when neither was sent.
+
+    `fields` replaces `default`; `include` adds relationships to whichever applies.
+    """
+    if fields is None and include is None:
+        return None
+    selected = _names(fields) if fields is not None else set(default)
+    unknown = selected - DETAIL_FIELDS
+    if unknown:
+        raise FieldsetError(f"Unknown field: {', '.join(sorted(unknown))}")
+    included = _names(include or '')
+    unknown = included - INCLUDABLE
+    if unknown:
+        raise FieldsetError(f"Cannot include: {', '.join(sorted(unknown))}")
+    return frozenset(selected | included | {"id"})
+
+
+def fieldset_options(fieldset):
+    """load_only the columns the fieldset reads and load only the relationships it names."""
+    columns = {Post.id, Post.created_at}
+    for name in fieldset:
+        columns.update(FIELD_COLUMNS.get(name, ()))
+    options = [load_only(*columns)]
+    if "owner" in fieldset:
+        options.append(joinedload(Post.user).load_only(User.id, User.username, User.email, User.created_at))
+    if "category" in fieldset:
+        options.append(joinedload(Post.category))
+    if "tags" in fieldset:
+        options.append(selectinload(Post.tags))
+    if "comments" in fieldset:
+        options.append(selectinload(Post.comments).joinedload(Comment.user))
+    # Anything else is a bug in the serializer, not a reason for a lazy query
+    options.append(raiseload('*'))
+    return tuple(options)
+
+
+def post_fieldset_query(fieldset):
+    return Post.query.options(*fieldset_options(fieldset))
+
+
+def detail_options(with_replies=False):
+    """Loader options for a single post with its whole graph in a fixed number of queries.
+
+    Owner and category ride on the main SELECT; tags, comments (with their
+    authors joined) and, when asked for, replies (with authors) are each one
+    selectin query no matter how many rows they return.
+    """
+    comments = selectinload(Post.comments)
+    options = [
+        joinedload(Post.user),
+        joinedload(Post.category),
+        selectinload(Post.tags),
+        comments.joinedload(Comment.user),
+    ]
+    if with_replies:
+        options.append(comments.selectinload(Comment.replies).joinedload(Reply.user))
+    return tuple(options)
+
+
+def post_detail_query(with_replies=False):
+    return Post.query.options(*detail_options(with_replies))
+
+
+def comment_query():
+    return Comment.query.options(joinedload(Comment.user))
+
+
+MAX_BATCH_COMMENTS = 100
+
+
+def parse_comment_ids(values):
+    """Accept [1, 2], ["1,2"] or a mix; raise ValueError on anything that is not an id."""
+    ids = []
+    for value in values:
+        parts = value.split(',') if isinstance(value, str) else [value]
+        ids.extend(int(part) for part in parts if str(part).strip())
+    return list(dict.fromkeys(ids))
+
+
+def replies_statement(comment_ids, per_comment):
+    """First `per_comment` replies of each comment, oldest first, authors joined."""
+    ranked = (
+        select(
+            Reply.id,
+            func.row_number().over(
+                partition_by=Reply.comment_id,
+                order_by=(Reply.created_at, Reply.id),
+            ).label('position'),
+        )
+        .where(Reply.comment_id.in_(comment_ids))
+        .subquery()
+    )
+    return (
+        select(Reply).options(joinedload(Reply.user))
+        .join(ranked, ranked.c.id == Reply.id)
+        .where(ranked.c.position <= per_comment)
+        .order_by(Reply.comment_id, Reply.created_at, Reply.id)
+    )
+
+
+def group_replies(replies):
+    grouped = defaultdict(list)
+    for reply in replies:
+        grouped[reply.comment_id].append(reply)
+    return grouped
+
+
+def replies_for_comments(comment_ids, per_comment):
+    """replies_statement run in one query and grouped by comment id."""
+    if not comment_ids:
+        return {}
+    return group_replies(db.session.execute(replies_statement(comment_ids, per_comment)).scalars())
+
+
+def reply_counts_statement(comment_ids):
+    """Stored reply counts; reads the comments by primary key instead of counting replies."""
+    return select(Comment.id, Comment.reply_count).where(Comment.id.in_(comment_ids))
+
+
+def reply_counts(comment_ids):
+    if not comment_ids:
+        return {}
+    return dict(db.session.execute(reply_counts_statement(comment_ids)).all())
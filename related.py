@@ -0,0 +1,370 @@
+"""Tag-overlap related-posts index.
+
+post_neighbors holds, for every post, its NEIGHBORS_PER_POST best published
+neighbours ranked by Jaccard overlap of their tag sets plus a recency term.
+The recency term is RECENCY_WEIGHT per year of the neighbour's created_at, so
+within one list it orders exactly like "overlap minus age" and never has to
+be recomputed as time passes.
+
+refresh_neighbors() is called by every write that changes a post's tags or
+visibility. It recomputes that post's own list and updates the other lists
+with a fixed number of set-based statements. The post is offered to the lists
+it now qualifies for, where it displaces the tail. Where it is already listed
+its rank is rewritten; it is evicted when it ranks worse than before and no
+longer beats the rest of a full list. A full list that loses an entry is
+refilled by neighbor_refills after the write commits, off the request.
+add_posts() does the same for a batch of new posts (bulk import), and
+rebuild_all() recomputes everything (after loading data outside the API).
+"""
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import delete, event, func, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+from models import db, Post, PostNeighbor, post_tags
+
+NEIGHBORS_PER_POST = 10
+RECENCY_WEIGHT = 0.1  # one year newer is worth 0.1 of Jaccard overlap
+EPOCH = datetime(2020, 1, 1)
+IN_CHUNK = 500
+
+
+def recency(created_at):
+    return RECENCY_WEIGHT * (created_at - EPOCH).total_seconds() / (365 * 86400)
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), IN_CHUNK):
+        yield ids[start:start + IN_CHUNK]
+
+
+def _candidates(post_id, exclude=None):
+    """(other_id, score, rank_of_other, published) for every post sharing a tag with post_id."""
+    mine = post_tags.alias('mine')
+    theirs = post_tags.alias('theirs')
+    counted = post_tags.alias('counted')
+    shared = (
+        select(theirs.c.post_id.label('post_id'), func.count().label('overlap'))
+        .select_from(mine.join(theirs, theirs.c.tag_id == mine.c.tag_id))
+        .where(mine.c.post_id == post_id, theirs.c.post_id.notin_([post_id, exclude or post_id]))
+        .group_by(theirs.c.post_id)
+        .subquery()
+    )
+    own = db.session.execute(select(func.count()).where(post_tags.c.post_id == post_id)).scalar()
+    their_tags = select(func.count()).where(counted.c.post_id == shared.c.post_id).scalar_subquery()
+    rows = db.session.execute(
+        select(Post.id, Post.created_at, Post.published, shared.c.overlap, their_tags)
+        .join(shared, shared.c.post_id == Post.id)
+    )
+    result = []
+    for other, created_at, published, overlap, count in rows:
+        score = overlap / (own + count - overlap)
+        result.append((other, score, score + recency(created_at), published))
+    return result
+
+
+def _write_list(post_id, candidates):
+    published = [c for c in candidates if c[3]]
+    best = sorted(published, key=lambda c: (c[2], c[0]), reverse=True)[:NEIGHBORS_PER_POST]
+    db.session.execute(delete(PostNeighbor).where(PostNeighbor.post_id == post_id))
+    if best:
+        db.session.execute(insert(PostNeighbor), [
+            {"post_id": post_id, "neighbor_id": n, "score": score, "rank": rank}
+            for n, score, rank, _ in best
+        ])
+
+
+def _list_stats(post_ids, without=None):
+    """{post_id: (entries, lowest rank)} for the given lists, leaving out the entry for `without`."""
+    stats = {}
+    for chunk in _chunks(post_ids):
+        query = select(PostNeighbor.post_id, func.count(), func.min(PostNeighbor.rank)) \
+            .where(PostNeighbor.post_id.in_(chunk)).group_by(PostNeighbor.post_id)
+        if without is not None:
+            query = query.where(PostNeighbor.neighbor_id != without)
+        stats.update((row[0], (row[1], row[2])) for row in db.session.execute(query))
+    return stats
+
+
+def _offer(rows, stats):
+    """Add the PostNeighbor rows that make the top NEIGHBORS_PER_POST of their list, evicting what they displace."""
+    offered = defaultdict(list)
+    for row in rows:
+        size, tail = stats.get(row["post_id"], (0, None))
+        if size < NEIGHBORS_PER_POST or row["rank"] >= tail:
+            offered[row["post_id"]].append(row)
+
+    accepted, evicted, overflowing = [], [], []
+    for other, offers in offered.items():
+        if stats.get(other, (0, None))[0] + len(offers) > NEIGHBORS_PER_POST:
+            overflowing.append(other)
+        else:
+            accepted.extend(offers)
+    for chunk in _chunks(overflowing):
+        entries = defaultdict(list)
+        for other, neighbor_id, rank in db.session.execute(
+            select(PostNeighbor.post_id, PostNeighbor.neighbor_id, PostNeighbor.rank)
+            .where(PostNeighbor.post_id.in_(chunk))
+        ):
+            entries[other].append((rank, neighbor_id, None))
+        for other in chunk:
+            merged = entries[other] + [(row["rank"], row["neighbor_id"], row) for row in offered[other]]
+            # The same (rank, neighbor_id) order as rebuild_all()
+            merged.sort(key=lambda entry: entry[:2], reverse=True)
+            accepted.extend(row for _, _, row in merged[:NEIGHBORS_PER_POST] if row is not None)
+            evicted.extend((other, neighbor_id) for _, neighbor_id, row in merged[NEIGHBORS_PER_POST:] if row is None)
+
+    for chunk in _chunks(evicted):
+        db.session.execute(delete(PostNeighbor).where(
+            tuple_(PostNeighbor.post_id, PostNeighbor.neighbor_id).in_(chunk)
+        ))
+    if accepted:
+        db.session.execute(insert(PostNeighbor), accepted)
+
+
+def refresh_neighbors(post_id, deleted=False):
+    """Bring post_neighbors up to date after post_id was created, retagged, (un)published or deleted.
+
+    Runs inside the caller's transaction. Flush a created or edited post first so
+    its tags are visible; call it for a deleted post before deleting it.
+    """
+    listed_in = dict(db.session.execute(
+        select(PostNeighbor.post_id, PostNeighbor.rank).where(PostNeighbor.neighbor_id == post_id)
+    ).all())
+
+    offers = {}  # other post -> (score, rank) of this post in its list
+    if deleted:
+        db.session.execute(delete(PostNeighbor).where(PostNeighbor.post_id == post_id))
+    else:
+        candidates = _candidates(post_id)
+        _write_list(post_id, candidates)
+        post = db.session.execute(select(Post.published, Post.created_at).where(Post.id == post_id)).one()
+        if post.published:
+            my_recency = recency(post.created_at)
+            offers = {other: (score, score + my_recency) for other, score, _, _ in candidates}
+
+    stats = _list_stats(set(listed_in) | set(offers), without=post_id)
+    moved, evicted, refill = [], [], set()
+    for other, old_rank in listed_in.items():
+        size, tail = stats.get(other, (0, None))
+        full = size + 1 >= NEIGHBORS_PER_POST
+        offer = offers.pop(other, None)
+        # Everything outside a list ranks below all of it, so a rank that rose, a list with
+        # room to spare, or a rank still above the rest of the list all keep the list exact
+        if offer is not None and (offer[1] >= old_rank or not full or offer[1] > tail):
+            moved.append({"post_id": other, "neighbor_id": post_id, "score": offer[0], "rank": offer[1]})
+            continue
+        evicted.append(other)
+        if full:
+            refill.add(other)  # some unlisted post may deserve the free place
+
+    if moved:
+        db.session.execute(update(PostNeighbor), moved)
+    for chunk in _chunks(evicted):
+        db.session.execute(delete(PostNeighbor).where(
+            PostNeighbor.neighbor_id == post_id, PostNeighbor.post_id.in_(chunk)
+        ))
+
+    _offer([
+        {"post_id": other, "neighbor_id": post_id, "score": score, "rank": rank}
+        for other, (score, rank) in offers.items()
+    ], stats)
+
+    neighbor_refills.schedule(refill, exclude=post_id if deleted else None)
+
+
+def _overlaps(post_ids, exclude=None):
+    """({post_id: {other: score}} over every post sharing a tag, {published post: recency}), in memory."""
+    tags_of = defaultdict(set)
+    for chunk in _chunks(post_ids):
+        for post_id, tag_id in db.session.execute(
+            select(post_tags.c.post_id, post_tags.c.tag_id).where(post_tags.c.post_id.in_(chunk))
+        ):
+            tags_of[post_id].add(tag_id)
+    posts_of = defaultdict(set)
+    for chunk in _chunks(set().union(*tags_of.values())):
+        for post_id, tag_id in db.session.execute(
+            select(post_tags.c.post_id, post_tags.c.tag_id).where(post_tags.c.tag_id.in_(chunk))
+        ):
+            posts_of[tag_id].add(post_id)
+
+    tag_counts, published = {}, {}
+    for chunk in _chunks(set().union(*posts_of.values()) - {exclude}):
+        tag_counts.update(db.session.execute(
+            select(post_tags.c.post_id, func.count()).where(post_tags.c.post_id.in_(chunk))
+            .group_by(post_tags.c.post_id)
+        ).all())
+        published.update(
+            (row.id, recency(row.created_at)) for row in db.session.execute(
+                select(Post.id, Post.created_at).where(Post.id.in_(chunk), Post.published == True)
+            )
+        )
+
+    scores = {}
+    for post_id, mine in tags_of.items():
+        overlap = defaultdict(int)
+        for tag_id in mine:
+            for other in posts_of[tag_id]:
+                if other != post_id and other in tag_counts:
+                    overlap[other] += 1
+        scores[post_id] = {
+            other: shared / (len(mine) + tag_counts[other] - shared) for other, shared in overlap.items()
+        }
+    return scores, published
+
+
+def _best_neighbors(scores, published):
+    """PostNeighbor rows for the lists in `scores`, in rebuild_all() order."""
+    rows = []
+    for post_id, others in scores.items():
+        scored = sorted(
+            ((score + published[other], other, score) for other, score in others.items() if other in published),
+            reverse=True,
+        )
+        rows.extend(
+            {"post_id": post_id, "neighbor_id": other, "score": score, "rank": rank}
+            for rank, other, score in scored[:NEIGHBORS_PER_POST]
+        )
+    return rows
+
+
+def refill_lists(post_ids, exclude=None):
+    """Recompute the lists of the given posts, leaving `exclude` out of them."""
+    post_ids = sorted(post_ids)
+    rows = _best_neighbors(*_overlaps(post_ids, exclude=exclude))
+    for chunk in _chunks(post_ids):
+        db.session.execute(delete(PostNeighbor).where(PostNeighbor.post_id.in_(chunk)))
+    if rows:
+        db.session.execute(insert(PostNeighbor), rows)
+
+
+def add_posts(post_ids):
+    """Fit newly inserted posts into the index with set-based statements (bulk import).
+
+    Their own lists are scored together in memory, and each published one is
+    offered to the lists of the existing posts it shares tags with. Runs inside
+    the caller's transaction.
+    """
+    new = set(post_ids)
+    scores, published = _overlaps(new)
+    rows = _best_neighbors(scores, published)
+    if rows:
+        db.session.execute(insert(PostNeighbor), rows)
+
+    stats = _list_stats(set().union(*scores.values()) - new)
+    # The rank an offer needs to get in: the tail of a full list, anything for the rest
+    needed = {other: tail for other, (size, tail) in stats.items() if size >= NEIGHBORS_PER_POST}
+    offers = []
+    for post_id, others in scores.items():
+        if post_id not in published:
+            continue
+        my_recency = published[post_id]
+        for other, score in others.items():
+            rank = score + my_recency
+            if rank >= needed.get(other, rank) and other not in new:
+                offers.append({"post_id": other, "neighbor_id": post_id, "score": score, "rank": rank})
+    _offer(offers, stats)
+
+
+class NeighborRefills:
+    """Refills lists that lost an entry, on a background thread once the write has committed.
+
+    With RELATED_REFILL_WORKERS=0 they are refilled inline, inside the write's transaction.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.workers = 1
+        self._executor = None
+        self._owner_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('RELATED_REFILL_WORKERS', 1)
+        self.app = app
+        self.workers = app.config['RELATED_REFILL_WORKERS']
+        if self.workers > 0:
+            event.listen(Session, 'after_commit', self._submit)
+            event.listen(Session, 'after_rollback', self._discard)
+
+    def _pool(self):
+        # Created lazily and per process, like the thumbnail pool
+        with self._lock:
+            if self._executor is None or self._owner_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='related-refills')
+                self._owner_pid = os.getpid()
+            return self._executor
+
+    def schedule(self, post_ids, exclude=None):
+        """Refill these lists after the current transaction commits (or now, inline)."""
+        if not post_ids:
+            return
+        if self.app is None or self.workers <= 0:
+            refill_lists(post_ids, exclude=exclude)
+            return
+        db.session.info.setdefault('related_refills', set()).update(post_ids)
+
+    def _submit(self, session):
+        post_ids = session.info.pop('related_refills', None)
+        if post_ids:
+            return self._pool().submit(self._refill, post_ids)
+
+    def _discard(self, session):
+        session.info.pop('related_refills', None)
+
+    def _refill(self, post_ids):
+        with self.app.app_context():
+            try:
+                refill_lists(post_ids)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Refilling related posts for {len(post_ids)} posts failed: {e}")
+
+
+
+def rebuild_all(batch_size=1000):
+    """Recompute every list from scratch in a single pass over post_tags."""
+    tags_of = defaultdict(set)
+    posts_of = defaultdict(set)
+    for post_id, tag_id in db.session.execute(select(post_tags.c.post_id, post_tags.c.tag_id)):
+        tags_of[post_id].add(tag_id)
+        posts_of[tag_id].add(post_id)
+    published = {
+        row.id: recency(row.created_at)
+        for row in db.session.execute(select(Post.id, Post.created_at).where(Post.published == True))
+    }
+
+    db.session.execute(delete(PostNeighbor))
+    post_ids = [row[0] for row in db.session.execute(select(Post.id))]
+    rows = []
+    for post_id in post_ids:
+        mine = tags_of.get(post_id, set())
+        overlap = defaultdict(int)
+        for tag_id in mine:
+            for other in posts_of[tag_id]:
+                if other != post_id and other in published:
+                    overlap[other] += 1
+        scored = []
+        for other, shared in overlap.items():
+            score = shared / (len(mine) + len(tags_of[other]) - shared)
+            scored.append((score + published[other], other, score))
+        scored.sort(reverse=True)
+        rows.extend(
+            {"post_id": post_id, "neighbor_id": other, "score": score, "rank": rank}
+            for rank, other, score in scored[:NEIGHBORS_PER_POST]
+        )
+        if len(rows) >= batch_size:
+            db.session.execute(insert(PostNeighbor), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(PostNeighbor), rows)
+    db.session.commit()
+    return len(post_ids)
+
+
+neighbor_refills = NeighborRefills()
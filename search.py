@@ -0,0 +1,77 @@
+"""Ranked full-text search over post title, excerpt and content.
+
+The index lives in the database and is maintained there: an FTS5 table with
+triggers on SQLite and a generated tsvector column with a GIN index on
+Postgres (see migration 773aad4c02f6). Create, PUT, PATCH and delete all
+reach it without any application code.
+"""
+import re
+from models import db
+from pagination import PaginationError, decode_token, encode_token
+
+SQLITE_SEARCH = """
+    SELECT id, score FROM (
+        SELECT rowid AS id, -bm25(posts_fts, 10.0, 5.0, 1.0) AS score
+        FROM posts_fts WHERE posts_fts MATCH :query
+    ) AS hits
+    {after}
+    ORDER BY score DESC, id DESC
+    LIMIT :limit
+"""
+
+POSTGRES_SEARCH = """
+    SELECT id, score FROM (
+        SELECT id, ts_rank_cd(search_vector, websearch_to_tsquery('english', :query)) AS score
+        FROM posts WHERE search_vector @@ websearch_to_tsquery('english', :query)
+    ) AS hits
+    {after}
+    ORDER BY score DESC, id DESC
+    LIMIT :limit
+"""
+
+AFTER_CURSOR = "WHERE score < :score OR (score = :score AND id < :id)"
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate from dropping the search objects that are not in the models."""
+    if type_ == 'table' and name.startswith('posts_fts'):
+        return False
+    if type_ == 'column' and name == 'search_vector':
+        return False
+    return True
+
+
+def fts5_query(text):
+    """Turn free text into an FTS5 expression that cannot be a syntax error."""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def search_posts(text, limit, cursor=None):
+    """Return (ranked post ids with scores, next_cursor) for one page of results."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        sql, query = SQLITE_SEARCH, fts5_query(text)
+    elif dialect == 'postgresql':
+        sql, query = POSTGRES_SEARCH, text
+    else:
+        raise RuntimeError(f"Full-text search is not available on {dialect}")
+    if not query:
+        return [], None
+
+    params = {"query": query, "limit": limit + 1}
+    after = ''
+    if cursor:
+        try:
+            score, row_id = decode_token(cursor)
+            params.update(score=float(score), id=int(row_id))
+        except (ValueError, TypeError):
+            raise PaginationError("Invalid cursor")
+        after = AFTER_CURSOR
+
+    hits = db.session.execute(db.text(sql.format(after=after)), params).all()
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_token([hits[-1].score, hits[-1].id])
+    return [(hit.id, hit.score) for hit in hits], next_cursor
@@ -1,6 +1,25 @@
+"""Seed the database.
+
+    python seed.py
+        Wipe the tables and load the hand-written demo content.
+
+    python seed.py --users 100000 --posts 1000000 --comments-per-post 5
+        Wipe the tables and generate synthetic data for load testing. The same
+        arguments and --seed always produce the same rows. Authors, comment
+        and reply counts and tag popularity follow power laws, so a few posts
+        get most of the discussion, as in production. Rows go in through Core
+        inserts in chunks; --related also rebuilds the related-posts index,
+        which is slow at millions of posts.
+"""
+import argparse
+import itertools
 import random
-from models import db, User, Post, Comment, Category, Tag, Reply
+import re
+from datetime import datetime, timedelta
+from models import db, User, Post, Comment, Category, Tag, Reply, PostNeighbor, CategoryStats, TagStats, post_tags
 from app import app
+from related import rebuild_all
+from stats import refresh_stats
 from werkzeug.security import generate_password_hash
 
 # --- Kenyan Users ---
@@ -182,17 +201,24 @@ replies_data = [
     "Wewe ni mtu wa busara. Good advice for all of us.",
 ]
 
-with app.app_context():
-    # --- Clear existing data ---
+
+def clear_tables():
     db.session.query(Reply).delete()
     db.session.query(Comment).delete()
     db.session.execute(db.text('DELETE FROM post_tags'))
+    db.session.query(PostNeighbor).delete()
     db.session.query(Post).delete()
+    db.session.query(TagStats).delete()
+    db.session.query(CategoryStats).delete()
     db.session.query(Tag).delete()
     db.session.query(Category).delete()
     db.session.query(User).delete()
     db.session.commit()
 
+
+def seed_demo():
+    clear_tables()
+
     # --- Seed Users ---
     users = []
     for u in kenyan_users:
@@ -262,7 +288,199 @@ with app.app_context():
             db.session.add(reply)
     db.session.commit()
 
+    # --- Related posts index ---
+    rebuild_all()
+
     print(f"✅ Seeded {len(users)} users, {len(categories)} categories, {len(tags)} tags, {len(posts)} posts, {len(comments)} comments, and replies.")
     print("\n📋 Login credentials (all users):")
     for u in kenyan_users:
         print(f"  {u['username']} : Password123")
+
+
+# --- Synthetic data ---
+CHUNK_SIZE = 5000
+START = datetime(2024, 1, 1)  # fixed so runs with the same seed are identical
+SPAN = timedelta(days=730)
+SKEW = 1.1           # Zipf exponent for author activity and tag popularity
+TAIL = 1.6           # Pareto shape for comments per post and replies per comment
+MAX_THREAD = 2000    # cap on comments per post and replies per comment
+WORDS = sorted(set(re.findall(r"[A-Za-z][a-z']+", " ".join(
+    p["content"] for p in posts_data
+))))
+
+
+def _zipf_weights(n):
+    """Cumulative weights for picking ranks 1..n with probability proportional to 1/rank**SKEW."""
+    return list(itertools.accumulate(1 / (rank ** SKEW) for rank in range(1, n + 1)))
+
+
+def _heavy_tail(rng, mean):
+    """A Pareto-distributed count with the given mean; most values are small, a few are huge."""
+    if mean <= 0:
+        return 0
+    return min(int(mean * (TAIL - 1) * (rng.paretovariate(TAIL) - 1) + 0.5), MAX_THREAD)
+
+
+class _Chunked:
+    """Buffers rows per table and writes them with executemany in CHUNK_SIZE batches."""
+
+    def __init__(self, *tables):
+        self.rows = {table: [] for table in tables}
+        self.counts = {table: 0 for table in tables}
+
+    def add(self, table, row):
+        self.rows[table].append(row)
+
+    def full(self):
+        return any(len(rows) >= CHUNK_SIZE for rows in self.rows.values())
+
+    def flush(self):
+        # Dict order is foreign key order: parents first
+        for table, rows in self.rows.items():
+            if rows:
+                db.session.execute(table.insert(), rows)
+                self.counts[table] += len(rows)
+                rows.clear()
+        db.session.commit()
+
+
+def _reset_sequences():
+    """Rows are inserted with explicit ids; move Postgres sequences past them."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for table in ('users', 'categories', 'tags', 'posts', 'comments', 'replies'):
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+        ))
+    db.session.commit()
+
+
+def generate(users=1000, posts=20000, comments_per_post=5, replies_per_comment=1,
+             categories=8, tags_per_category=12, seed=42):
+    """Fill the current app's (emptied) database with deterministic synthetic data; returns row counts."""
+    rng = random.Random(seed)
+    password_hash = generate_password_hash('Password123')
+    user_table, post_table = User.__table__, Post.__table__
+    comment_table, reply_table = Comment.__table__, Reply.__table__
+
+    out = _Chunked(user_table)
+    for user_id in range(1, users + 1):
+        out.add(user_table, {
+            "id": user_id, "username": f"user{user_id}", "email": f"user{user_id}@example.com",
+            "password_hash": password_hash, "created_at": START - timedelta(days=rng.randint(0, 365)),
+        })
+        if out.full():
+            out.flush()
+    out.flush()
+
+    names = list(categories_data)
+    category_rows, tags_by_category, tag_id = [], {}, 0
+    for category_id in range(1, categories + 1):
+        name = names[category_id - 1] if category_id <= len(names) else f"Category {category_id}"
+        category_rows.append({"id": category_id, "name": name})
+        known = categories_data.get(name, [])
+        for n in range(tags_per_category):
+            tag_id += 1
+            tag_name = known[n] if n < len(known) else f"{name} {n + 1}"
+            tags_by_category.setdefault(category_id, []).append({"id": tag_id, "name": tag_name,
+                                                                 "category_id": category_id})
+    db.session.execute(Category.__table__.insert(), category_rows)
+    db.session.execute(Tag.__table__.insert(), [t for tags in tags_by_category.values() for t in tags])
+    db.session.commit()
+
+    # Prolific users write most posts and comments; popular tags and categories get most posts
+    user_weights = _zipf_weights(users)
+    category_weights = _zipf_weights(categories)
+    tag_weights = _zipf_weights(tags_per_category)
+    category_ids = list(range(1, categories + 1))
+    comment_pool = [c for pool in comments_data.values() for c in pool]
+
+    out = _Chunked(post_table, post_tags, comment_table, reply_table)
+    comment_id = reply_id = 0
+    for post_id in range(1, posts + 1):
+        # Evenly spaced over SPAN so ids and created_at agree, like real inserts
+        created_at = START + SPAN * (post_id / max(posts, 1))
+        category_id = rng.choices(category_ids, cum_weights=category_weights)[0]
+        paragraphs = max(1, int(rng.lognormvariate(1, 0.6)))
+        content = "\n\n".join(
+            " ".join(rng.choices(WORDS, k=rng.randint(40, 120))) for _ in range(paragraphs)
+        )
+        post = {
+            "id": post_id,
+            "title": " ".join(rng.choices(WORDS, k=rng.randint(3, 9))).capitalize(),
+            "excerpt": " ".join(rng.choices(WORDS, k=rng.randint(10, 25))),
+            "content": content,
+            "user_id": rng.choices(range(1, users + 1), cum_weights=user_weights)[0],
+            "category_id": category_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "published": rng.random() < 0.85,
+            "comment_count": 0,
+            "reply_count": 0,
+        }
+        out.add(post_table, post)
+        candidates = tags_by_category[category_id]
+        chosen = {t["id"] for t in rng.choices(candidates, cum_weights=tag_weights, k=rng.randint(1, 4))}
+        for tag in sorted(chosen):
+            out.add(post_tags, {"post_id": post_id, "tag_id": tag})
+
+        for _ in range(_heavy_tail(rng, comments_per_post)):
+            comment_id += 1
+            commented_at = created_at + timedelta(minutes=int(rng.expovariate(1 / 600)))
+            comment = {
+                "id": comment_id, "content": rng.choice(comment_pool), "post_id": post_id,
+                "user_id": rng.choices(range(1, users + 1), cum_weights=user_weights)[0],
+                "created_at": commented_at, "reply_count": 0,
+            }
+            out.add(comment_table, comment)
+            post["comment_count"] += 1
+            for _ in range(_heavy_tail(rng, replies_per_comment)):
+                reply_id += 1
+                # Core inserts skip the session hook that keeps these counters; rows are still buffered
+                comment["reply_count"] += 1
+                post["reply_count"] += 1
+                out.add(reply_table, {
+                    "id": reply_id, "content": rng.choice(replies_data), "comment_id": comment_id,
+                    "user_id": rng.choices(range(1, users + 1), cum_weights=user_weights)[0],
+                    "created_at": commented_at + timedelta(minutes=int(rng.expovariate(1 / 120))),
+                })
+        if out.full():
+            out.flush()
+    out.flush()
+    _reset_sequences()
+    refresh_stats()
+    return {"users": users, "posts": posts, "comments": out.counts[comment_table],
+            "replies": out.counts[reply_table]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with demo or synthetic data.")
+    parser.add_argument('--users', type=int, help="Generate synthetic data with this many users")
+    parser.add_argument('--posts', type=int, help="Generate synthetic data with this many posts")
+    parser.add_argument('--comments-per-post', type=float, default=5, help="Mean comments per post")
+    parser.add_argument('--replies-per-comment', type=float, default=1, help="Mean replies per comment")
+    parser.add_argument('--categories', type=int, default=8)
+    parser.add_argument('--tags-per-category', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42, help="RNG seed; the same seed gives the same data")
+    parser.add_argument('--related', action='store_true', help="Also rebuild the related-posts index")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.users is None and args.posts is None:
+            seed_demo()
+            return
+        clear_tables()
+        counts = generate(
+            users=args.users or 1000, posts=args.posts or 20000,
+            comments_per_post=args.comments_per_post, replies_per_comment=args.replies_per_comment,
+            categories=args.categories, tags_per_category=args.tags_per_category, seed=args.seed,
+        )
+        if args.related:
+            rebuild_all()
+        print(f"✅ Generated {counts['users']} users, {counts['posts']} posts, "
+              f"{counts['comments']} comments and {counts['replies']} replies (seed {args.seed}).")
+        print("📋 Every user logs in with password Password123.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""JSON encoding shared by jsonify and the Flask-RESTful resources.
+
+FastJSONProvider encodes with orjson when it is installed and falls back to
+the stdlib encoder otherwise. Either way the output decodes to the same value
+as with Flask's default provider (keys sorted, dates in HTTP format) and is
+compact unless app.json.compact is False or the app runs in debug mode.
+orjson writes non-ASCII text as UTF-8 rather than \\u escapes.
+"""
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def _orjson_options(self, indent):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def _encode(self, obj, pretty):
+        """Encoded bytes of obj."""
+        if orjson is None:
+            kwargs = {"indent": 2} if pretty else {"separators": (",", ":")}
+            return super().dumps(obj, **kwargs).encode()
+        # PASSTHROUGH_DATETIME hands datetimes to the stdlib default, keeping Flask's format
+        return orjson.dumps(obj, default=self.default, option=self._orjson_options(pretty))
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or set(kwargs) - {"indent", "separators"}:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, bool(kwargs.get("indent"))).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, pretty) + b"\n", mimetype=self.mimetype)
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful representation that goes through the app's JSON provider."""
+    response = current_app.json.response(data)
+    response.status_code = code
+    response.headers.extend(headers or {})
+    return response
@@ -0,0 +1,301 @@
+"""Per-category and per-tag post statistics.
+
+category_stats and tag_stats hold, for every category and tag, how many posts
+and published posts it has and when the newest of each was created. The
+/categories/stats and /tags/stats endpoints read them as they are, so no
+request ever runs a GROUP BY over posts or post_tags.
+
+A session hook keeps them current through every ORM write. Before a flush it
+notes what each changed or deleted post counted towards; after the flush it
+applies the differences as `count = count + n` updates in the same
+transaction. Adding a post can only move a latest time forwards, which is a
+compare in the UPDATE. Removing one re-reads that row's MAX from the posts.
+refresh_stats() recounts some or all rows for writes that bypass the ORM
+(bulk import, generated seed data).
+"""
+from sqlalchemy import case, delete, event, func, insert, inspect, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, Category, CategoryStats, Post, Tag, TagStats, post_tags
+
+IN_CHUNK = 500
+# Post attributes that decide which rows a post counts towards
+TRACKED = ('category_id', 'category', 'published', 'tags')
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), IN_CHUNK):
+        yield ids[start:start + IN_CHUNK]
+
+
+class Contribution:
+    """What one post counts towards: its category and tags, whether it is published, and when it was created."""
+
+    def __init__(self, category_id, published, created_at, tag_ids):
+        self.targets = {(CategoryStats, category_id)} if category_id is not None else set()
+        self.targets.update((TagStats, tag_id) for tag_id in tag_ids)
+        self.published = bool(published)
+        self.created_at = created_at
+
+    @classmethod
+    def of(cls, post):
+        return cls(post.category_id, post.published, post.created_at, [tag.id for tag in post.tags])
+
+
+def _stored_contributions(post_ids):
+    """Contributions as the database has them, before the flush changes anything."""
+    if not post_ids:
+        return {}
+    tags = {}
+    rows = {}
+    for chunk in _chunks(post_ids):
+        for post_id, tag_id in db.session.execute(
+            select(post_tags.c.post_id, post_tags.c.tag_id).where(post_tags.c.post_id.in_(chunk))
+        ):
+            tags.setdefault(post_id, []).append(tag_id)
+        rows.update((row.id, row) for row in db.session.execute(
+            select(Post.id, Post.category_id, Post.published, Post.created_at).where(Post.id.in_(chunk))
+        ))
+    return {
+        post_id: Contribution(row.category_id, row.published, row.created_at, tags.get(post_id, []))
+        for post_id, row in rows.items()
+    }
+
+
+class _Changes:
+    """Per stats row: count deltas, a newer latest time, or a flag to re-read the latest time."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def _row(self, target):
+        return self.rows.setdefault(target, {"posts": 0, "published": 0, "newest": None,
+                                             "newest_published": None, "recount_latest": False})
+
+    def add(self, target, published, created_at):
+        row = self._row(target)
+        row["posts"] += 1
+        row["newest"] = max(filter(None, (row["newest"], created_at)), default=None)
+        if published:
+            self.publish(target, created_at)
+
+    def remove(self, target, published):
+        row = self._row(target)
+        row["posts"] -= 1
+        row["recount_latest"] = True
+        if published:
+            row["published"] -= 1
+
+    def publish(self, target, created_at):
+        row = self._row(target)
+        row["published"] += 1
+        row["newest_published"] = max(filter(None, (row["newest_published"], created_at)), default=None)
+
+    def unpublish(self, target):
+        row = self._row(target)
+        row["published"] -= 1
+        row["recount_latest"] = True
+
+    def diff(self, old, new):
+        if old is None:
+            for target in new.targets:
+                self.add(target, new.published, new.created_at)
+            return
+        if new is None:
+            for target in old.targets:
+                self.remove(target, old.published)
+            return
+        for target in old.targets - new.targets:
+            self.remove(target, old.published)
+        for target in new.targets - old.targets:
+            self.add(target, new.published, new.created_at)
+        for target in old.targets & new.targets:
+            if new.published and not old.published:
+                self.publish(target, new.created_at)
+            elif old.published and not new.published:
+                self.unpublish(target)
+
+
+def _key_column(model):
+    return CategoryStats.category_id if model is CategoryStats else TagStats.tag_id
+
+
+def _latest(model, key, published_only):
+    """MAX(created_at) over the posts of one category or tag."""
+    query = select(func.max(Post.created_at))
+    if model is CategoryStats:
+        query = query.where(Post.category_id == key)
+    else:
+        query = query.join(post_tags, post_tags.c.post_id == Post.id).where(post_tags.c.tag_id == key)
+    if published_only:
+        query = query.where(Post.published == True)
+    return query.scalar_subquery()
+
+
+def _later(column, value):
+    return case((or_(column.is_(None), column < value), value), else_=column)
+
+
+def _ensure_rows(session, model, keys):
+    """Create missing stats rows; concurrent writers creating the same row do not conflict."""
+    column = _key_column(model)
+    rows = [{column.key: key} for key in keys]
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        session.execute(sqlite.insert(model).on_conflict_do_nothing(), rows)
+    elif dialect == 'postgresql':
+        session.execute(postgresql.insert(model).on_conflict_do_nothing(), rows)
+    else:
+        existing = set(session.execute(select(column).where(column.in_(keys))).scalars())
+        missing = [row for row in rows if row[column.key] not in existing]
+        if missing:
+            session.execute(insert(model), missing)
+
+
+def _apply(session, changes, deleted_keys):
+    by_model = {}
+    for (model, key), row in changes.rows.items():
+        if key not in deleted_keys[model]:
+            by_model.setdefault(model, {})[key] = row
+    for model, rows in by_model.items():
+        column = _key_column(model)
+        _ensure_rows(session, model, sorted(rows))
+        for key, row in sorted(rows.items()):
+            values = {}
+            if row["posts"]:
+                values["post_count"] = model.post_count + row["posts"]
+            if row["published"]:
+                values["published_count"] = model.published_count + row["published"]
+            if row["recount_latest"]:
+                values["latest_post_at"] = _latest(model, key, published_only=False)
+                values["latest_published_at"] = _latest(model, key, published_only=True)
+            else:
+                if row["newest"] is not None:
+                    values["latest_post_at"] = _later(model.latest_post_at, row["newest"])
+                if row["newest_published"] is not None:
+                    values["latest_published_at"] = _later(model.latest_published_at, row["newest_published"])
+            if values:
+                session.execute(
+                    update(model).where(column == key).values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+
+
+@event.listens_for(Session, 'before_flush')
+def _note_stored_contributions(session, flush_context, instances):
+    changed = [
+        post for post in session.dirty
+        if isinstance(post, Post) and any(inspect(post).attrs[name].history.has_changes() for name in TRACKED)
+    ]
+    deleted = [post for post in session.deleted if isinstance(post, Post)]
+    if not changed and not deleted and not any(isinstance(obj, Post) for obj in session.new):
+        return
+    with session.no_autoflush:
+        stored = _stored_contributions([post.id for post in changed + deleted])
+    session.info['post_stats'] = (changed, deleted, stored)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_post_stats(session, flush_context):
+    noted = session.info.pop('post_stats', None)
+    deleted_keys = {
+        CategoryStats: {obj.id for obj in session.deleted if isinstance(obj, Category)},
+        TagStats: {obj.id for obj in session.deleted if isinstance(obj, Tag)},
+    }
+    for model, keys in deleted_keys.items():
+        # ON DELETE CASCADE is not enforced on SQLite without the foreign_keys pragma
+        for chunk in _chunks(keys):
+            session.execute(delete(model).where(_key_column(model).in_(chunk)))
+    if noted is None:
+        return
+    changed, deleted, stored = noted
+    changes = _Changes()
+    with session.no_autoflush:
+        for post in session.new:
+            if isinstance(post, Post):
+                changes.diff(None, Contribution.of(post))
+        for post in changed:
+            changes.diff(stored.get(post.id), Contribution.of(post))
+        for post in deleted:
+            changes.diff(stored.get(post.id), None)
+    _apply(session, changes, deleted_keys)
+
+
+def _recount(model, keys):
+    """(key, post_count, published_count, latest_post_at, latest_published_at) rows, grouped in SQL."""
+    published_at = case((Post.published == True, Post.created_at))
+    aggregates = (
+        func.count(Post.id),
+        func.count(published_at),
+        func.max(Post.created_at),
+        func.max(published_at),
+    )
+    if model is CategoryStats:
+        query = select(Category.id, *aggregates).outerjoin(Post, Post.category_id == Category.id) \
+            .group_by(Category.id)
+        key = Category.id
+    else:
+        query = select(Tag.id, *aggregates).outerjoin(post_tags, post_tags.c.tag_id == Tag.id) \
+            .outerjoin(Post, Post.id == post_tags.c.post_id).group_by(Tag.id)
+        key = Tag.id
+    if keys is not None:
+        query = query.where(key.in_(keys))
+    return db.session.execute(query).all()
+
+
+def _rewrite(model, keys):
+    column = _key_column(model)
+    names = (column.key, 'post_count', 'published_count', 'latest_post_at', 'latest_published_at')
+    if keys is None:
+        db.session.execute(delete(model))
+        rows = [dict(zip(names, row)) for row in _recount(model, None)]
+    else:
+        rows = []
+        for chunk in _chunks(sorted(keys)):
+            db.session.execute(delete(model).where(column.in_(chunk)))
+            rows.extend(dict(zip(names, row)) for row in _recount(model, chunk))
+    if rows:
+        db.session.execute(insert(model), rows)
+
+
+def refresh_stats(category_ids=None, tag_ids=None):
+    """Recount the given categories and tags, or every one when neither is given; commits."""
+    everything = category_ids is None and tag_ids is None
+    if everything or category_ids:
+        _rewrite(CategoryStats, None if everything else set(category_ids))
+    if everything or tag_ids:
+        _rewrite(TagStats, None if everything else set(tag_ids))
+    db.session.commit()
+
+
+def _counts(stats):
+    if stats is None:
+        return {"post_count": 0, "published_count": 0, "latest_post_at": None, "latest_published_at": None}
+    return {
+        "post_count": stats.post_count,
+        "published_count": stats.published_count,
+        "latest_post_at": stats.latest_post_at.isoformat() if stats.latest_post_at else None,
+        "latest_published_at": stats.latest_published_at.isoformat() if stats.latest_published_at else None,
+    }
+
+
+def category_stats():
+    """Every category with its counts, by name."""
+    rows = db.session.execute(
+        select(Category.id, Category.name, CategoryStats)
+        .outerjoin(CategoryStats, CategoryStats.category_id == Category.id)
+        .order_by(Category.name)
+    )
+    return [{"id": id, "name": name, **_counts(stats)} for id, name, stats in rows]
+
+
+def tag_stats():
+    """Every tag with its counts, by name."""
+    rows = db.session.execute(
+        select(Tag.id, Tag.name, Tag.category_id, TagStats)
+        .outerjoin(TagStats, TagStats.tag_id == Tag.id)
+        .order_by(Tag.name)
+    )
+    return [{"id": id, "name": name, "category_id": category_id, **_counts(stats)}
+            for id, name, category_id, stats in rows]
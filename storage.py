@@ -0,0 +1,118 @@
+"""Content-addressed upload storage.
+
+Uploads are streamed to a temporary file while being hashed and then moved
+to `<sha256>.<ext>`. Identical bytes therefore always land on the same name,
+and a per-process index of known hashes lets repeat uploads return the
+existing URL without writing or even stat-ing anything.
+
+Because a name never changes meaning, send() serves uploads as immutable,
+with the name as a strong ETag, and can hand the transfer to the front proxy
+(X-Sendfile or nginx's X-Accel-Redirect) instead of streaming from Python.
+"""
+import hashlib
+import mimetypes
+import os
+import tempfile
+import threading
+from flask import current_app, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+SENDFILE_MODES = ('', 'x-sendfile', 'x-accel-redirect')
+# os.umask can only be read by setting it; do it once, at import, before any threads exist
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+class UploadStore:
+    def __init__(self):
+        self.folder = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('UPLOAD_SENDFILE', '')
+        app.config.setdefault('UPLOAD_ACCEL_PREFIX', '/_uploads/')
+        if app.config['UPLOAD_SENDFILE'] not in SENDFILE_MODES:
+            raise ValueError(f"Unknown UPLOAD_SENDFILE mode: {app.config['UPLOAD_SENDFILE']}")
+        self.folder = app.config['UPLOAD_FOLDER']
+        self.sendfile = app.config['UPLOAD_SENDFILE']
+        self.accel_prefix = app.config['UPLOAD_ACCEL_PREFIX']
+        # send_file reads this flag itself
+        if self.sendfile == 'x-sendfile':
+            app.config['USE_X_SENDFILE'] = True
+        self._index = None
+
+    def _known(self):
+        # Built once per process from a single directory listing
+        if self._index is None:
+            index = {}
+            os.makedirs(self.folder, exist_ok=True)
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    digest, dot, ext = entry.name.partition('.')
+                    if dot and len(digest) == 64 and entry.is_file():
+                        index[digest] = entry.name
+            self._index = index
+        return self._index
+
+    def save(self, file_storage, ext):
+        """Store an uploaded file; returns (filename, created)."""
+        digest = hashlib.sha256()
+        os.makedirs(self.folder, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = file_storage.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                # mkstemp creates 0600; give stored files the usual mode so a front proxy can read them
+                os.fchmod(tmp.fileno(), 0o666 & ~UMASK)
+            key = digest.hexdigest()
+            with self._lock:
+                existing = self._known().get(key)
+                if existing:
+                    os.unlink(tmp_path)
+                    return existing, False
+                filename = f"{key}.{ext.lower()}"
+                # Atomic; if another worker stored the same bytes meanwhile, the content is identical
+                os.replace(tmp_path, os.path.join(self.folder, filename))
+                self._known()[key] = filename
+                return filename, True
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def send(self, filename, immutable=True):
+        """Response for an upload. Pass immutable=False when serving stand-in bytes for filename."""
+        etag = filename.rsplit('.', 1)[0]
+        if self.sendfile == 'x-accel-redirect':
+            # nginx streams the file and answers Range requests from an internal location
+            path = safe_join(self.folder, filename)
+            if path is None or not os.path.isfile(path):
+                raise NotFound()
+            response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['X-Accel-Redirect'] = self.accel_prefix + filename
+            response.set_etag(etag)
+            response = response.make_conditional(request)
+        else:
+            # Conditional and Range requests are handled by send_file
+            response = send_from_directory(self.folder, filename, etag=etag)
+        if immutable:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.max_age = None
+            response.cache_control.no_cache = True
+        return response
+
+
+upload_store = UploadStore()
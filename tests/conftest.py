@@ -0,0 +1,107 @@
+"""Fixtures for the test suite: the app on a fresh in-memory SQLite database per test.
+
+No app context stays pushed during a test, so every request gets its own
+session the way it would in production. The make_* helpers open their own
+context and return ids.
+"""
+import os
+
+# Configure before app.py is imported: it reads the environment at import time
+os.environ['DATABASE_URI'] = 'sqlite://'
+os.environ['AUTH_TOKEN_SECRET'] = 'test-token-secret'
+os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+os.environ['THUMBNAIL_WORKERS'] = '0'
+os.environ['RELATED_REFILL_WORKERS'] = '0'
+
+import pytest
+from sqlalchemy import event
+from app import app as flask_app
+from auth import issue_token
+from models import db, Category, Comment, Post, PostNeighbor, Reply, Tag, User
+from related import rebuild_all
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """The statements run against the database, appended as they execute."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def _add(*objects):
+    db.session.add_all(objects)
+    db.session.commit()
+    return [obj.id for obj in objects]
+
+
+def make_user(username='alice'):
+    with flask_app.app_context():
+        # Tests never log in with a password, so skip the deliberately slow hash
+        return _add(User(username=username, email=f"{username}@example.com", password_hash='unusable'))[0]
+
+
+def make_tags(*names, category='General'):
+    with flask_app.app_context():
+        category = Category.query.filter_by(name=category).first() or Category(name=category)
+        return _add(*(Tag(name=name, category=category) for name in names))
+
+
+def make_post(user_id, tag_ids, title='Post', published=True, **values):
+    with flask_app.app_context():
+        tags = Tag.query.filter(Tag.id.in_(tag_ids)).all()
+        values = {"content": f"{title} content", "excerpt": f"{title} excerpt", **values}
+        post = Post(title=title, user_id=user_id, category_id=tags[0].category_id, published=published,
+                    tags=tags, **values)
+        return _add(post)[0]
+
+
+def add_comments(post_id, user_id, count):
+    with flask_app.app_context():
+        return _add(*(Comment(content=f"Comment {n}", user_id=user_id, post_id=post_id) for n in range(count)))
+
+
+def add_replies(comment_id, user_id, count):
+    with flask_app.app_context():
+        return _add(*(Reply(content=f"Reply {n}", user_id=user_id, comment_id=comment_id) for n in range(count)))
+
+
+def auth_header(user_id):
+    with flask_app.app_context():
+        return {'Authorization': f"Bearer {issue_token(user_id)}"}
+
+
+def neighbor_lists(app):
+    """The related-posts index as {(post_id, neighbor_id): rank}."""
+    with app.app_context():
+        rows = db.session.execute(db.select(PostNeighbor.post_id, PostNeighbor.neighbor_id, PostNeighbor.rank))
+        return {(post_id, neighbor_id): round(rank, 9) for post_id, neighbor_id, rank in rows}
+
+
+def rebuilt_lists(app):
+    """The index after recomputing it from scratch."""
+    with app.app_context():
+        rebuild_all()
+    return neighbor_lists(app)
@@ -0,0 +1,72 @@
+import time
+import pytest
+from flask import Flask
+from itsdangerous import URLSafeSerializer
+from auth import TOKEN_SALT, init_auth
+from conftest import auth_header, make_post, make_tags, make_user
+from models import db, Post
+
+
+def post_author(app, post_id):
+    with app.app_context():
+        return db.session.get(Post, post_id).user_id
+
+
+def replacement(tag_ids):
+    return {"title": "Replaced", "content": "New body", "excerpt": "New", "category_id": 1, "tag_ids": tag_ids}
+
+
+def test_post_edits_need_the_author(app, client):
+    author, other = make_user('author'), make_user('other')
+    tags = make_tags('python')
+    post_id = make_post(author, tags)
+
+    for method, body in (('put', replacement(tags)), ('patch', {"title": "Changed"}), ('delete', None)):
+        send = getattr(client, method)
+        assert send(f'/posts/{post_id}', json=body).status_code == 401
+        assert send(f'/posts/{post_id}', json=body, headers=auth_header(other)).status_code == 403
+    assert client.get(f'/posts/{post_id}').get_json()['title'] == 'Post'
+
+
+def test_user_id_in_the_body_does_not_move_a_post(app, client):
+    author, other = make_user('author'), make_user('other')
+    tags = make_tags('python')
+    post_id = make_post(author, tags)
+    headers = auth_header(author)
+
+    response = client.put(f'/posts/{post_id}', headers=headers, json={**replacement(tags), "user_id": other})
+    assert response.status_code == 200
+    assert post_author(app, post_id) == author
+
+    response = client.patch(f'/posts/{post_id}', headers=headers, json={"user_id": other, "title": "Patched"})
+    assert response.status_code == 200
+    assert response.get_json()['title'] == 'Patched'
+    assert post_author(app, post_id) == author
+
+    assert client.delete(f'/posts/{post_id}', headers=headers).status_code == 200
+
+
+def test_tokens_signed_with_another_secret_are_rejected(app, client):
+    author = make_user('author')
+    post_id = make_post(author, make_tags('python'))
+    forged = URLSafeSerializer('supersecretkey', salt=TOKEN_SALT).dumps({"sub": author, "exp": int(time.time()) + 60})
+
+    response = client.patch(f'/posts/{post_id}', headers={'Authorization': f'Bearer {forged}'}, json={"title": "Forged"})
+    assert response.status_code == 401
+
+
+def test_expired_tokens_are_rejected(app, client, monkeypatch):
+    author = make_user('author')
+    post_id = make_post(author, make_tags('python'))
+    monkeypatch.setitem(app.config, 'AUTH_TOKEN_TTL', -1)
+    headers = auth_header(author)
+
+    response = client.patch(f'/posts/{post_id}', headers=headers, json={"title": "Late"})
+    assert response.status_code == 401
+
+
+def test_startup_needs_a_signing_secret():
+    bare = Flask(__name__)
+    bare.config['AUTH_TOKEN_SECRET'] = None
+    with pytest.raises(RuntimeError):
+        init_auth(bare)
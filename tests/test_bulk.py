@@ -0,0 +1,28 @@
+import random
+from datetime import datetime, timedelta
+from conftest import auth_header, make_post, make_tags, make_user, neighbor_lists, rebuilt_lists
+
+
+def test_bulk_import_fits_new_posts_into_the_related_index(app, client):
+    rng = random.Random(3)
+    user = make_user()
+    tags = make_tags(*(f"tag{n}" for n in range(5)))
+    start = datetime(2024, 1, 1)
+    for n in range(30):
+        make_post(user, rng.sample(tags, rng.randint(1, 3)), title=f"Existing {n}",
+                  created_at=start + timedelta(days=rng.randint(0, 700)))
+    rebuilt_lists(app)
+
+    items = [
+        {"title": f"Imported {n}", "content": "Body", "excerpt": "Short", "category_id": 1,
+         "tag_ids": rng.sample(tags, rng.randint(1, 3)), "published": n % 4 != 0}
+        for n in range(40)
+    ]
+    items.append({"title": "Broken", "content": "Body", "excerpt": "Short", "category_id": 1, "tag_ids": [999]})
+    response = client.post('/posts/bulk', headers=auth_header(user), json=items)
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert len(body["created"]) == 40
+    assert body["errors"] == [{"index": 40, "error": "One or more tags not found"}]
+    assert neighbor_lists(app) == rebuilt_lists(app)
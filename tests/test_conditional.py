@@ -0,0 +1,80 @@
+from conftest import add_comments, make_post, make_tags, make_user
+from models import db, Category, Tag, User
+
+
+def revalidate(client, url):
+    """A first GET, then the status of a conditional GET with its ETag."""
+    etag = client.get(url).headers['ETag']
+    return lambda: client.get(url, headers={'If-None-Match': etag}).status_code
+
+
+def test_unchanged_posts_answer_304(app, client):
+    post_id = make_post(make_user(), make_tags('python'))
+
+    for url in (f'/posts/{post_id}', '/posts', f'/posts/{post_id}/comments', '/categories', '/tags'):
+        assert revalidate(client, url)() == 304
+
+
+def test_renaming_an_embedded_user_moves_the_etags(app, client):
+    author, commenter = make_user('author'), make_user('commenter')
+    post_id = make_post(author, make_tags('python'))
+    add_comments(post_id, commenter, 1)
+    checks = [revalidate(client, url) for url in (f'/posts/{post_id}', '/posts', f'/posts/{post_id}/comments')]
+
+    client.patch(f'/users/{author}', json={"username": "renamed"})
+    client.patch(f'/users/{commenter}', json={"username": "renamed-commenter"})
+
+    assert [check() for check in checks] == [200, 200, 200]
+    assert client.get(f'/posts/{post_id}').get_json()['owner']['username'] == 'renamed'
+
+
+def test_renaming_a_category_or_tag_moves_the_etags(app, client):
+    tag_id = make_tags('python')[0]
+    post_id = make_post(make_user(), [tag_id])
+
+    # Categories and tags embed nothing else, so each list keeps its ETag when the other changes
+    for model, row_id, expected in ((Category, 1, [200, 200, 200, 304]), (Tag, tag_id, [200, 200, 304, 200])):
+        checks = [revalidate(client, url) for url in (f'/posts/{post_id}', '/posts', '/categories', '/tags')]
+        with app.app_context():
+            db.session.get(model, row_id).name = f"renamed-{model.__tablename__}"
+            db.session.commit()
+        assert [check() for check in checks] == expected
+
+
+def test_a_missing_category_or_tag_is_404_even_with_a_matching_etag(app, client):
+    make_tags('python')
+
+    for url in ('/categories', '/tags'):
+        etag = client.get(url).headers['ETag']
+        assert client.get(f'{url}/999', headers={'If-None-Match': etag}).status_code == 404
+        assert client.get(f'{url}/1', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_new_users_and_tags_leave_existing_etags_alone(app, client):
+    author = make_user('author')
+    post_id = make_post(author, make_tags('python'))
+    add_comments(post_id, author, 1)
+    checks = [revalidate(client, url) for url in (f'/posts/{post_id}', '/posts', f'/posts/{post_id}/comments')]
+
+    make_user('newcomer')
+    make_tags('rust', category='Systems')
+    with app.app_context():
+        # Not shown in any body, e.g. a login upgrading the password hash
+        db.session.get(User, author).password_hash = 'rehashed'
+        db.session.commit()
+
+    assert [check() for check in checks] == [304, 304, 304]
+
+
+def test_deleting_a_tag_moves_the_etags_of_its_posts(app, client):
+    python, rust = make_tags('python', 'rust')
+    user_id = make_user()
+    tagged, untouched = make_post(user_id, [python, rust]), make_post(user_id, [python])
+    checks = [revalidate(client, url) for url in (f'/posts/{tagged}', f'/posts/{untouched}', '/posts')]
+
+    with app.app_context():
+        db.session.delete(db.session.get(Tag, rust))
+        db.session.commit()
+
+    assert [check() for check in checks] == [200, 304, 200]
+    assert [t['name'] for t in client.get(f'/posts/{tagged}').get_json()['tags']] == ['python']
@@ -0,0 +1,56 @@
+from sqlalchemy import update
+from conftest import auth_header, make_post, make_tags, make_user
+from counters import check_counts
+from models import db, Comment, Post
+
+
+def counts(client, post_id):
+    post = client.get(f'/posts/{post_id}').get_json()
+    comments = {c['id']: c['reply_count'] for c in client.get(f'/posts/{post_id}/comments').get_json()}
+    return post['comment_count'], post['reply_count'], comments
+
+
+def test_counters_follow_comments_and_replies_through_the_api(app, client):
+    user_id = make_user()
+    headers = auth_header(user_id)
+    post_id = make_post(user_id, make_tags('python'))
+
+    first, second = (
+        client.post(f'/posts/{post_id}/comments', headers=headers, json={"content": f"Comment {n}"}).get_json()['id']
+        for n in range(2)
+    )
+    replies = [
+        client.post('/replies', headers=headers, json={"content": f"Reply {n}", "comment_id": comment_id}).get_json()['id']
+        for n, comment_id in enumerate([first, first, first, second])
+    ]
+    assert counts(client, post_id) == (2, 4, {first: 3, second: 1})
+
+    assert client.delete(f'/replies/{replies[0]}', headers=headers).status_code == 200
+    assert counts(client, post_id) == (2, 3, {first: 2, second: 1})
+
+    # Deleting a comment takes its replies with it
+    assert client.delete(f'/posts/{post_id}/comments/{first}', headers=headers).status_code == 200
+    assert counts(client, post_id) == (1, 1, {second: 1})
+
+
+def test_check_counts_finds_and_repairs_drift(app, client):
+    user_id = make_user()
+    headers = auth_header(user_id)
+    post_id = make_post(user_id, make_tags('python'))
+    comment_id = client.post(f'/posts/{post_id}/comments', headers=headers, json={"content": "Hi"}).get_json()['id']
+    client.post('/replies', headers=headers, json={"content": "Hello", "comment_id": comment_id})
+    etag = client.get(f'/posts/{post_id}').headers['ETag']
+
+    with app.app_context():
+        assert check_counts() == {"comments": 0, "posts": 0}
+        # Writes that go around the session hook leave the counters behind
+        db.session.execute(update(Post).values(comment_count=5, reply_count=0))
+        db.session.execute(update(Comment).values(reply_count=9))
+        db.session.commit()
+
+        assert check_counts() == {"comments": 1, "posts": 1}
+        assert check_counts(repair=True) == {"comments": 1, "posts": 1}
+        assert check_counts() == {"comments": 0, "posts": 0}
+
+    assert counts(client, post_id) == (1, 1, {comment_id: 1})
+    assert client.get(f'/posts/{post_id}', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,33 @@
+from conftest import auth_header, make_post, make_tags, make_user
+from pagination import LEGACY_PAGE_SIZE
+
+
+def link_target(response):
+    link = response.headers['Link']
+    assert link.endswith('>; rel="next"')
+    return link[1:link.index('>')]
+
+
+def test_lists_without_limit_are_capped_and_deprecated(app, client):
+    user_id = make_user()
+    tags = make_tags('python')
+    ids = [make_post(user_id, tags, title=f"Post {n}") for n in range(LEGACY_PAGE_SIZE + 1)]
+
+    for url, headers in (('/posts', {}), ('/posts/my-posts', auth_header(user_id))):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert response.headers['Deprecation'] == 'true'
+        assert [post['id'] for post in response.get_json()] == ids[:0:-1]
+
+        rest = client.get(link_target(response), headers=headers).get_json()
+        assert [post['id'] for post in rest['posts']] == [ids[0]]
+        assert rest['next_cursor'] is None
+
+
+def test_short_lists_have_no_next_link(app, client):
+    make_post(make_user(), make_tags('python'))
+
+    response = client.get('/posts?fields=id,title')
+    assert response.headers['Deprecation'] == 'true'
+    assert 'Link' not in response.headers
+    assert len(response.get_json()) == 1
@@ -0,0 +1,21 @@
+from conftest import add_comments, make_post, make_tags, make_user
+
+
+def test_post_detail_query_count_does_not_grow_with_comments(client, queries):
+    user = make_user()
+    tags = make_tags('python', 'flask')
+    quiet = make_post(user, tags, title='Quiet')
+    busy = make_post(user, tags, title='Busy')
+    add_comments(busy, make_user('bob'), 25)
+
+    queries.clear()
+    response = client.get(f'/posts/{quiet}')
+    assert response.status_code == 200
+    assert response.get_json()['comments'] == []
+    without_comments = len(queries)
+
+    queries.clear()
+    response = client.get(f'/posts/{busy}')
+    assert response.status_code == 200
+    assert len(response.get_json()['comments']) == 25
+    assert len(queries) == without_comments
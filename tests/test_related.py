@@ -0,0 +1,66 @@
+import random
+from datetime import datetime, timedelta
+from conftest import auth_header, make_post, make_tags, make_user, neighbor_lists, rebuilt_lists
+from related import NEIGHBORS_PER_POST
+
+
+def test_incremental_updates_match_a_full_rebuild(app, client):
+    rng = random.Random(7)
+    user = make_user()
+    headers = auth_header(user)
+    tags = make_tags(*(f"tag{n}" for n in range(6)))
+    start = datetime(2024, 1, 1)
+    posts = [
+        make_post(user, rng.sample(tags, rng.randint(1, 3)), title=f"Post {n}",
+                  published=rng.random() < 0.8, created_at=start + timedelta(days=rng.randint(0, 700)))
+        for n in range(40)
+    ]
+    rebuilt_lists(app)
+
+    for step in range(60):
+        action = rng.choice(['retag', 'retag', 'publish', 'delete', 'create'])
+        post_id = rng.choice(posts)
+        if action == 'retag':
+            response = client.patch(f'/posts/{post_id}', headers=headers,
+                                    json={"tag_ids": rng.sample(tags, rng.randint(1, 3))})
+        elif action == 'publish':
+            response = client.patch(f'/posts/{post_id}', headers=headers, json={"published": rng.random() < 0.5})
+        elif action == 'delete':
+            response = client.delete(f'/posts/{post_id}', headers=headers)
+            posts.remove(post_id)
+        else:
+            response = client.post('/posts', headers=headers, json={
+                "title": f"New {step}", "content": "Body", "excerpt": "Short",
+                "category_id": 1, "tag_ids": rng.sample(tags, rng.randint(1, 3)),
+            })
+            posts.append(response.get_json()['id'])
+        assert response.status_code in (200, 201), response.get_json()
+
+        incremental = neighbor_lists(app)
+        assert incremental == rebuilt_lists(app), f"step {step}: {action} of post {post_id}"
+
+
+def test_retag_cost_does_not_grow_with_the_lists_a_post_is_in(app, client, queries):
+    user = make_user()
+    headers = auth_header(user)
+    start = datetime(2024, 1, 1)
+
+    def retag_statements(listed_in):
+        common, side = make_tags(f"common{listed_in}", f"side{listed_in}")
+        # Each other post shares only `common` with the rest, so the newest post tops every list
+        for n in range(listed_in):
+            own = make_tags(f"own{listed_in}-{n}")
+            make_post(user, [common] + own, title=f"Other {n}", created_at=start + timedelta(days=n))
+        post_id = make_post(user, [common, side], title='Moving', created_at=start + timedelta(days=1000))
+        rebuilt_lists(app)
+        assert sum(1 for (_, neighbor) in neighbor_lists(app) if neighbor == post_id) == listed_in
+
+        queries.clear()
+        # Dropping the side tag raises its overlap with every other post: each entry moves up in place
+        response = client.patch(f'/posts/{post_id}', headers=headers, json={"tag_ids": [common]})
+        assert response.status_code == 200
+        statements = len(queries)
+        assert neighbor_lists(app) == rebuilt_lists(app)
+        return statements
+
+    assert retag_statements(NEIGHBORS_PER_POST * 6) == retag_statements(NEIGHBORS_PER_POST * 2)
@@ -0,0 +1,25 @@
+import pytest
+from conftest import add_comments, add_replies, make_post, make_tags, make_user
+
+
+@pytest.mark.parametrize('body', [[1, 2], 7, "1,2", None])
+def test_batch_replies_reject_a_body_that_is_not_an_object(app, client, body):
+    response = client.post('/replies/batch', json=body)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('query', ['comment_id=abc', 'comment_id=1,abc', 'comment_id=1&comment_id=x'])
+def test_replies_reject_comment_ids_that_are_not_integers(app, client, query):
+    response = client.get(f'/replies?{query}')
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "comment_id must be a list of integers"}
+
+
+def test_replies_for_one_and_several_comments(app, client):
+    user_id = make_user()
+    first, second = add_comments(make_post(user_id, make_tags('python')), user_id, 2)
+    add_replies(first, user_id, 3)
+
+    assert len(client.get(f'/replies?comment_id={first}').get_json()) == 3
+    grouped = client.post('/replies/batch', json={"comment_ids": [first, second]}).get_json()
+    assert grouped["reply_counts"] == {str(first): 3, str(second): 0}
@@ -0,0 +1,76 @@
+import os
+import pytest
+from flask_migrate import upgrade
+from conftest import auth_header, make_post, make_tags, make_user
+from models import db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+@pytest.fixture
+def search_app(app):
+    """The app on the migrated schema: the FTS5 table and its triggers only exist there."""
+    with app.app_context():
+        db.drop_all()
+        upgrade(directory=MIGRATIONS)
+    yield app
+    with app.app_context():
+        db.session.execute(db.text("DROP TABLE IF EXISTS posts_fts"))
+        db.session.execute(db.text("DROP TABLE IF EXISTS alembic_version"))
+        db.session.commit()
+
+
+def search(client, q, **params):
+    response = client.get('/posts/search', query_string={"q": q, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def hit_ids(client, q, **params):
+    return [post['id'] for post in search(client, q, **params)['posts']]
+
+
+def test_title_matches_rank_above_content_matches(search_app, client):
+    user, tags = make_user(), make_tags('python')
+    in_content = make_post(user, tags, title='Weekly notes', content='Some thoughts on gardening and walking')
+    in_title = make_post(user, tags, title='Gardening basics', content='Soil, seeds and water')
+    make_post(user, tags, title='Unrelated', content='Nothing to see')
+
+    results = search(client, 'gardening')['posts']
+    assert [post['id'] for post in results] == [in_title, in_content]
+    assert results[0]['score'] > results[1]['score']
+
+
+def test_cursor_pages_cover_every_hit_once(search_app, client):
+    user, tags = make_user(), make_tags('python')
+    for n in range(7):
+        make_post(user, tags, title=f"Post {n}", content=' '.join(['kettle'] * (n % 3 + 1)) + ' and more words')
+    everything = hit_ids(client, 'kettle', limit=100)
+    assert len(everything) == 7
+
+    paged, cursor = [], None
+    while True:
+        page = search(client, 'kettle', limit=3, **({"cursor": cursor} if cursor else {}))
+        paged += [post['id'] for post in page['posts']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert paged == everything
+    assert client.get('/posts/search?q=kettle&cursor=garbage').status_code == 400
+
+
+def test_edits_and_deletes_reach_the_index(search_app, client):
+    user = make_user()
+    headers = auth_header(user)
+    post_id = make_post(user, make_tags('python'), title='Teapots', content='All about teapots')
+    assert hit_ids(client, 'teapots') == [post_id]
+
+    response = client.patch(f'/posts/{post_id}', headers=headers, json={"title": 'Kettles', "content": 'Boiling water'})
+    assert response.status_code == 200
+    assert hit_ids(client, 'kettles') == [post_id]
+    # The excerpt still mentions the old title; only it matches now, so the post ranks lower
+    assert search(client, 'teapots')['posts'][0]['score'] < search(client, 'kettles')['posts'][0]['score']
+
+    assert client.delete(f'/posts/{post_id}', headers=headers).status_code == 200
+    assert hit_ids(client, 'kettles') == []
+    assert hit_ids(client, 'teapots') == []
@@ -0,0 +1,83 @@
+import random
+from datetime import datetime, timedelta
+from conftest import auth_header, make_post, make_tags, make_user
+from models import db, Category, Post, Tag
+from stats import refresh_stats
+
+
+def stats(client):
+    return client.get('/categories/stats').get_json(), client.get('/tags/stats').get_json()
+
+
+def recounted(app, client):
+    """The stats after recounting every row from the posts."""
+    with app.app_context():
+        refresh_stats()
+    return stats(client)
+
+
+def delete_row(app, model, row_id):
+    with app.app_context():
+        db.session.delete(db.session.get(model, row_id))
+        db.session.commit()
+
+
+def test_incremental_stats_match_a_full_recount(app, client):
+    rng = random.Random(11)
+    user = make_user()
+    headers = auth_header(user)
+    tags = make_tags(*(f"news{n}" for n in range(4)), category='News') \
+        + make_tags(*(f"tech{n}" for n in range(4)), category='Tech')
+    start = datetime(2024, 1, 1)
+    posts = [
+        make_post(user, rng.sample(tags, rng.randint(1, 3)), title=f"Post {n}", published=rng.random() < 0.7,
+                  created_at=start + timedelta(days=rng.randint(0, 700)))
+        for n in range(30)
+    ]
+    assert stats(client) == recounted(app, client)
+
+    def check(step):
+        incremental = stats(client)
+        assert incremental == recounted(app, client), step
+
+    # An older draft going live must not move latest_published_at past a newer published post
+    with app.app_context():
+        drafts = Post.query.filter(Post.published == False).order_by(Post.created_at).all()
+        oldest_draft, newest_published = drafts[0].id, \
+            Post.query.filter(Post.published == True).order_by(Post.created_at.desc()).first().id
+    for post_id, body in ((oldest_draft, {"published": True}), (newest_published, {"published": False})):
+        assert client.patch(f'/posts/{post_id}', headers=headers, json=body).status_code == 200
+        check(f"publish toggle of post {post_id}")
+
+    for step in range(50):
+        action = rng.choice(['create', 'title', 'retag', 'recategorize', 'publish', 'delete'])
+        post_id = rng.choice(posts)
+        if action == 'create':
+            response = client.post('/posts', headers=headers, json={
+                "title": f"New {step}", "content": "Body", "excerpt": "Short", "published": rng.random() < 0.5,
+                "category_id": rng.choice([1, 2]), "tag_ids": rng.sample(tags, rng.randint(1, 3)),
+            })
+            posts.append(response.get_json()['id'])
+        elif action == 'title':
+            response = client.patch(f'/posts/{post_id}', headers=headers, json={"title": f"Renamed {step}"})
+        elif action == 'retag':
+            response = client.patch(f'/posts/{post_id}', headers=headers,
+                                    json={"tag_ids": rng.sample(tags, rng.randint(0, 3))})
+        elif action == 'recategorize':
+            response = client.patch(f'/posts/{post_id}', headers=headers, json={"category_id": rng.choice([1, 2])})
+        elif action == 'publish':
+            response = client.patch(f'/posts/{post_id}', headers=headers, json={"published": rng.random() < 0.5})
+        else:
+            response = client.delete(f'/posts/{post_id}', headers=headers)
+            posts.remove(post_id)
+        assert response.status_code in (200, 201), response.get_json()
+        check(f"step {step}: {action} of post {post_id}")
+
+    # Deleting a tag drops it from its posts; deleting a category takes its posts and tags with it
+    delete_row(app, Tag, tags[0])
+    check("delete tag")
+    delete_row(app, Category, 2)
+    check("delete category")
+    categories, tag_rows = stats(client)
+    assert [row['name'] for row in categories] == ['News']
+    assert all(row['category_id'] == 1 for row in tag_rows)
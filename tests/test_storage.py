@@ -0,0 +1,19 @@
+import io
+import os
+import stat
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+from storage import UMASK, UploadStore
+
+
+def test_stored_uploads_are_readable_by_other_users(tmp_path):
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    store = UploadStore()
+    store.init_app(app)
+
+    filename, created = store.save(FileStorage(io.BytesIO(b'not really a png')), 'png')
+
+    assert created
+    assert stat.S_IMODE(os.stat(tmp_path / filename).st_mode) == 0o666 & ~UMASK
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.upload-')]
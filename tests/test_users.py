@@ -0,0 +1,26 @@
+import pytest
+from conftest import make_user
+from hashing import HashingUnavailable, password_hasher
+
+
+@pytest.fixture
+def saturated_hasher(monkeypatch):
+    def busy(password):
+        raise HashingUnavailable("Password hashing pool is saturated")
+    monkeypatch.setattr(password_hasher, 'hash', busy)
+
+
+def test_creating_a_user_while_hashing_is_saturated_is_503(app, client, saturated_hasher):
+    response = client.post('/users', json={"username": "bob", "email": "bob@example.com", "password": "long enough"})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get('/users').get_json() == []
+
+
+def test_changing_a_password_while_hashing_is_saturated_is_503(app, client, saturated_hasher):
+    user_id = make_user('alice')
+
+    response = client.patch(f'/users/{user_id}', json={"username": "renamed", "password": "long enough"})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get(f'/users/{user_id}').get_json()['username'] == 'alice'
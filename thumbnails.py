@@ -0,0 +1,117 @@
+"""Resized WebP derivatives of uploaded images.
+
+After an upload is stored, generate() queues a job on a small thread pool
+that writes `<stem>_<variant>.webp` next to the original for every size in
+VARIANTS; requests never wait for it. Variant URLs are derived from the
+upload's name, so posts can reference them right away: until the file
+exists, the upload route answers a variant request with the original.
+
+Needs Pillow; without it uploads still work and no variants are advertised.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency
+    Image = None
+
+UPLOAD_PREFIX = '/static/uploads/'
+VARIANTS = {"thumb": 320, "medium": 800}  # name -> max width in pixels
+SOURCE_EXTENSIONS = ('png', 'jpg', 'jpeg', 'gif', 'webp')
+WEBP_QUALITY = 80
+
+
+def variant_name(filename, variant):
+    return f"{filename.rsplit('.', 1)[0]}_{variant}.webp"
+
+
+def _render(source, target, width):
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        if img.width > width:
+            img.thumbnail((width, img.height))
+        tmp = f"{target}.tmp"
+        img.save(tmp, 'WEBP', quality=WEBP_QUALITY, method=4)
+    # Readers only ever see a complete file
+    os.replace(tmp, target)
+
+
+class ThumbnailGenerator:
+    def __init__(self):
+        self.folder = None
+        self.workers = 2
+        self._executor = None
+        self._owner_pid = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('THUMBNAIL_WORKERS', 2)
+        self.folder = app.config['UPLOAD_FOLDER']
+        self.workers = app.config['THUMBNAIL_WORKERS']
+
+    @property
+    def enabled(self):
+        return Image is not None and self.workers > 0
+
+    def _pool(self):
+        # Created lazily and per process, like the password hashing pool
+        if self._executor is None or self._owner_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='thumbnails')
+            self._owner_pid = os.getpid()
+        return self._executor
+
+    def _missing(self, filename):
+        return {
+            variant: width for variant, width in VARIANTS.items()
+            if not os.path.exists(os.path.join(self.folder, variant_name(filename, variant)))
+        }
+
+    def generate(self, filename):
+        """Queue the missing variants of an upload; returns the future, or None."""
+        if not self.enabled or not os.path.exists(os.path.join(self.folder, filename)):
+            return None
+        missing = self._missing(filename)
+        with self._lock:
+            if not missing or filename in self._pending:
+                return None
+            self._pending.add(filename)
+            return self._pool().submit(self._generate, filename, missing)
+
+    def _generate(self, filename, variants):
+        source = os.path.join(self.folder, filename)
+        try:
+            for variant, width in variants.items():
+                _render(source, os.path.join(self.folder, variant_name(filename, variant)), width)
+        except Exception as e:
+            print(f"Thumbnails for {filename} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(filename)
+
+    def variant_urls(self, image_url):
+        """{variant: url} for a local upload; empty for external URLs or without Pillow."""
+        if not self.enabled or not image_url or not image_url.startswith(UPLOAD_PREFIX):
+            return {}
+        filename = image_url[len(UPLOAD_PREFIX):]
+        return {variant: UPLOAD_PREFIX + variant_name(filename, variant) for variant in VARIANTS}
+
+    def original_for(self, filename):
+        """The upload a variant name was derived from, or None if it is not a variant."""
+        stem, dot, ext = filename.rpartition('.')
+        base, _, variant = stem.rpartition('_')
+        if not dot or ext != 'webp' or variant not in VARIANTS or not base:
+            return None
+        for source_ext in SOURCE_EXTENSIONS:
+            candidate = f"{base}.{source_ext}"
+            if os.path.exists(os.path.join(self.folder, candidate)):
+                return candidate
+        return None
+
+
+thumbnails = ThumbnailGenerator()